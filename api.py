@@ -0,0 +1,172 @@
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, jsonify, request
+from utils.data_store import get_recent_history
+from utils.micro_batcher import MicroBatcher
+from utils.ml_algorithms import ALGORITHM_MODELS, FORECAST_MODES, StockPredictor, get_ml_predictions, model_registry
+from utils.sentiment_analysis import analyze_sentiment_batch
+from utils.technical_indicators import calculate_technical_indicators
+
+app = Flask(__name__)
+
+MAX_FORECAST_DAYS = 365
+# Direct models are trained for the whole horizon, so it is kept shorter
+MAX_DIRECT_DAYS = 90
+MAX_TEXTS_PER_REQUEST = 256
+
+# Ticker symbols as Yahoo writes them (BRK-B, BF.B, ^GSPC, EURUSD=X). Symbols
+# name model and cache directories, so anything else is rejected.
+SYMBOL_PATTERN = re.compile(r"\^?[A-Z0-9][A-Z0-9.=-]{0,11}")
+
+# Models are fetched and fitted in this pool, outside the prediction batcher,
+# so a cold symbol never holds up forecasts for symbols already in memory
+FIT_WORKERS = 4
+fit_executor = ThreadPoolExecutor(max_workers=FIT_WORKERS, thread_name_prefix="model-fit")
+_fits = {}
+_fits_lock = threading.Lock()
+
+# Each batch's forecasts for different symbols, algorithms and modes run in
+# parallel here rather than one after another on the batcher thread
+FORECAST_WORKERS = 4
+forecast_executor = ThreadPoolExecutor(max_workers=FORECAST_WORKERS, thread_name_prefix="forecast")
+
+def fit_models(symbol, algorithm, mode):
+    """Fetch a symbol's history and fit its models, returning (history, predictor) or None"""
+    data = StockPredictor(symbol, algorithm).fetch_data(years=1)
+    if data is None:
+        return None
+    predictor = model_registry.get_predictor(symbol, algorithm, data)
+    if predictor is None:
+        return None
+    # Direct models are fitted for the longest horizon served, so any request fits
+    if mode == "direct" and not predictor.ensure_direct(data, MAX_DIRECT_DAYS):
+        return None
+    return data, predictor
+
+def ensure_models(symbol, algorithm, mode):
+    """Fit models in the pool, sharing one fit between concurrent requests for the same models"""
+    key = (symbol, algorithm, mode)
+    with _fits_lock:
+        future = _fits.get(key)
+        started = future is None
+        if started:
+            future = _fits[key] = fit_executor.submit(fit_models, symbol, algorithm, mode)
+    # Registered outside the lock: the callback runs at once if the fit already finished
+    if started:
+        future.add_done_callback(lambda done: _forget_fit(key, done))
+    return future.result()
+
+def _forget_fit(key, future):
+    with _fits_lock:
+        if _fits.get(key) is future:
+            del _fits[key]
+
+def _forecast_group(symbol, algorithm, mode, group):
+    """One forecast over the longest horizon in a group of requests"""
+    horizon = max(days for _, _, days, _, _, _ in group)
+    # The newest history any of them was fitted on, with the predictor fitted on it
+    _, _, _, _, data, predictor = max(group, key=lambda item: item[4].index[-1])
+    return get_ml_predictions(symbol, algorithm, days=horizon, data=data, mode=mode, predictor=predictor)
+
+def predict_batch(requests):
+    """Serve a batch of (symbol, algorithm, days, mode, data, predictor) forecast requests
+
+    Each request carries the predictor ensure_models fitted on ``data``, so
+    the batch only forecasts and never trains, even if the model registry
+    has since evicted it. Requests for the same symbol, algorithm and mode
+    share one forecast over the longest requested horizon, and the groups
+    are forecast concurrently.
+    """
+    groups = {}
+    for i, (symbol, algorithm, days, mode, data, predictor) in enumerate(requests):
+        groups.setdefault((symbol, algorithm, mode), []).append(i)
+
+    futures = {key: forecast_executor.submit(_forecast_group, *key, [requests[i] for i in indices])
+               for key, indices in groups.items()}
+    results = [None] * len(requests)
+    for key, indices in groups.items():
+        forecast = futures[key].result()
+        for i in indices:
+            if forecast is not None:
+                results[i] = {**forecast, 'predictions': forecast['predictions'][:requests[i][2]]}
+    return results
+
+def sentiment_batch(texts):
+    """Score a batch of texts with one batched transformer pass"""
+    return analyze_sentiment_batch(texts)
+
+prediction_batcher = MicroBatcher(predict_batch, max_batch_size=64, max_wait=0.01, name="prediction-batcher")
+sentiment_batcher = MicroBatcher(sentiment_batch, max_batch_size=128, max_wait=0.01, name="sentiment-batcher")
+
+@app.get("/health")
+def health():
+    return jsonify({"status": "ok"})
+
+@app.get("/api/predictions/<symbol>")
+def predictions(symbol):
+    symbol = symbol.upper()
+    if not SYMBOL_PATTERN.fullmatch(symbol):
+        return jsonify({"error": "Invalid ticker symbol"}), 400
+    algorithm = request.args.get("algorithm", "ensemble")
+    days = request.args.get("days", 30, type=int)
+    mode = request.args.get("mode", "recursive")
+    if algorithm not in ALGORITHM_MODELS:
+        return jsonify({"error": f"Unknown algorithm {algorithm}"}), 400
+    if mode not in FORECAST_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(FORECAST_MODES)}"}), 400
+    max_days = MAX_DIRECT_DAYS if mode == "direct" else MAX_FORECAST_DAYS
+    if days is None or not 1 <= days <= max_days:
+        return jsonify({"error": f"days must be between 1 and {max_days}"}), 400
+
+    fitted = ensure_models(symbol, algorithm, mode)
+    result = prediction_batcher((symbol, algorithm, days, mode, *fitted)) if fitted is not None else None
+    if result is None:
+        return jsonify({"error": f"No predictions available for {symbol}"}), 404
+
+    return jsonify({
+        **result,
+        "predictions": [
+            {"date": p["date"].strftime("%Y-%m-%d"), "price": float(p["price"])}
+            for p in result["predictions"]
+        ]
+    })
+
+@app.get("/api/indicators/<symbol>")
+def indicators(symbol):
+    symbol = symbol.upper()
+    if not SYMBOL_PATTERN.fullmatch(symbol):
+        return jsonify({"error": "Invalid ticker symbol"}), 400
+    days = request.args.get("days", 180, type=int)
+    if days is None or days < 1:
+        return jsonify({"error": "days must be a positive integer"}), 400
+
+    history = get_recent_history(symbol, days=days)
+    if history.empty:
+        return jsonify({"error": f"No data found for {symbol}"}), 404
+
+    values = calculate_technical_indicators(history)
+    return jsonify({"symbol": symbol, "indicators": {k: float(v) for k, v in values.items()}})
+
+@app.post("/api/sentiment")
+def sentiment():
+    payload = request.get_json(silent=True) or {}
+    texts = payload.get("texts")
+    if texts is None and "text" in payload:
+        texts = [payload["text"]]
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({"error": "Expected a JSON body with 'text' or a list of 'texts'"}), 400
+    if len(texts) > MAX_TEXTS_PER_REQUEST:
+        return jsonify({"error": f"At most {MAX_TEXTS_PER_REQUEST} texts per request"}), 400
+
+    # Each text joins the shared batch; concurrent requests are scored together
+    futures = [sentiment_batcher.submit(text) for text in texts]
+    return jsonify({"results": [future.result() for future in futures]})
+
+if __name__ == "__main__":
+    os.makedirs('models', exist_ok=True)
+    app.run(host=os.environ.get("API_HOST", "127.0.0.1"),
+            port=int(os.environ.get("API_PORT", "5000")),
+            threaded=True)
@@ -1,13 +1,18 @@
 
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
 import numpy as np
 from utils.technical_indicators import calculate_technical_indicators
-from utils.sentiment_analysis import get_stock_sentiment_summary
+from utils.data_store import get_recent_history
+from utils.market_data import get_provider
+from utils.sentiment_analysis import SUMMARY_STAGES, get_stock_sentiment_summary
+from utils.jobs import JobManager
+from utils.nlp_models import warm_up
+from utils.instrumentation import PrometheusExporter, recorder
 import os
+import time
 
 st.set_page_config(
     page_title="Stock Market Tracker",
@@ -18,6 +23,73 @@ st.set_page_config(
 # Create models directory if it doesn't exist
 os.makedirs('models', exist_ok=True)
 
+# Optionally load the sentiment models in the background right after a
+# deploy, instead of on the first "Generate ML Insights" click
+@st.cache_resource
+def start_nlp_warm_up():
+    """Start loading the NLP models once per process"""
+    return warm_up(background=True)
+
+if os.environ.get("WARM_UP_NLP_MODELS", "").lower() in ("1", "true", "yes"):
+    start_nlp_warm_up()
+
+@st.cache_resource
+def job_manager():
+    """Background job runner shared by every session in this process"""
+    return JobManager(max_workers=2)
+
+# Days of price history shown on the chart
+HISTORY_DAYS = 180
+
+# Cached data helpers. Entries are keyed by symbol, date range and trading day,
+# plus a per-symbol generation that is bumped to invalidate a stock's entries.
+@st.cache_resource
+def data_generations():
+    """Per-symbol cache generations shared by every session in this process"""
+    return {}
+
+def invalidate_symbol(symbol):
+    """Drop cached history, indicators and charts for a stock"""
+    generations = data_generations()
+    generations[symbol] = generations.get(symbol, 0) + 1
+
+def cache_key(symbol):
+    """Arguments identifying the cached data for a stock on the current trading day"""
+    return symbol, HISTORY_DAYS, datetime.now().strftime("%Y-%m-%d"), data_generations().get(symbol, 0)
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def load_history(symbol, days, trading_day, generation):
+    """Historical prices for the chart and indicators"""
+    return get_recent_history(symbol, days=days)
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def load_indicators(symbol, days, trading_day, generation):
+    """Technical indicators computed from the cached history"""
+    return calculate_technical_indicators(load_history(symbol, days, trading_day, generation))
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def build_price_figure(symbol, days, trading_day, generation):
+    """Candlestick chart of the cached history (callers get their own copy)"""
+    historical_data = load_history(symbol, days, trading_day, generation)
+    
+    fig = go.Figure()
+    fig.add_trace(go.Candlestick(
+        x=historical_data.index,
+        open=historical_data['Open'],
+        high=historical_data['High'],
+        low=historical_data['Low'],
+        close=historical_data['Close'],
+        name="Candlestick"
+    ))
+    
+    fig.update_layout(
+        title=f"{symbol} Stock Price",
+        xaxis_title="Date",
+        yaxis_title="Price (USD)",
+        height=500,
+    )
+    return fig
+
 # Initialize session state variables
 if "stocks" not in st.session_state:
     st.session_state.stocks = {
@@ -45,6 +117,9 @@ if "sentiment_data" not in st.session_state:
 if "selected_algorithm" not in st.session_state:
     st.session_state.selected_algorithm = "ensemble"
 
+if "insight_job_id" not in st.session_state:
+    st.session_state.insight_job_id = None
+
 # UI Layout
 st.title("Stock Market Tracker")
 
@@ -74,6 +149,8 @@ with col1:
             if st.session_state.search_mode == "local":
                 # Local search
                 if search_query.upper() in st.session_state.stocks:
+                    if search_query.upper() != st.session_state.selected_stock:
+                        invalidate_symbol(search_query.upper())
                     st.session_state.selected_stock = search_query.upper()
                     st.success(f"Found stock: {search_query.upper()}")
                 else:
@@ -81,14 +158,14 @@ with col1:
             else:
                 # Online search
                 try:
-                    stock_info = yf.Ticker(search_query.upper())
-                    info = stock_info.info
+                    provider = get_provider()
+                    info = provider.get_info(search_query.upper())
                     
                     if "shortName" in info:
                         # Add to session state if found
-                        latest_quote = stock_info.history(period="1d")
-                        if not latest_quote.empty:
-                            current_price = latest_quote['Close'].iloc[-1]
+                        latest_quote = provider.get_quote(search_query.upper())
+                        if latest_quote is not None:
+                            current_price = latest_quote['price']
                             prev_close = info.get('previousClose', current_price)
                             change = current_price - prev_close
                             
@@ -98,12 +175,15 @@ with col1:
                                 "change": change
                             }
                             
+                            if search_query.upper() != st.session_state.selected_stock:
+                                invalidate_symbol(search_query.upper())
                             st.session_state.selected_stock = search_query.upper()
                             st.success(f"Found and added stock: {info.get('shortName', search_query.upper())}")
                             
                             # Reset sentiment data
                             st.session_state.sentiment_data = None
                             st.session_state.show_ml_insights = False
+                            st.session_state.insight_job_id = None
                         else:
                             st.error(f"No recent data available for {search_query.upper()}")
                     else:
@@ -125,18 +205,22 @@ with col1:
             st.write(f"${stock_data['price']:.2f} <span style='color:{change_color}'>{change_symbol} {abs(stock_data['change']):.2f}</span>", unsafe_allow_html=True)
         
         if st.button(f"Select {symbol}"):
+            if symbol != st.session_state.selected_stock:
+                invalidate_symbol(symbol)
             st.session_state.selected_stock = symbol
             # Reset sentiment data when changing stocks
             st.session_state.sentiment_data = None
             st.session_state.show_ml_insights = False
+            st.session_state.insight_job_id = None
             st.experimental_rerun()
     
     # ML Algorithm Selection
     st.subheader("ML Algorithm")
     algorithm = st.radio(
         "Select Prediction Algorithm",
-        options=["Linear Regression", "Random Forest", "SVM", "Ensemble (All)"],
-        index=3,
+        options=["Linear Regression", "Random Forest", "SVM", "Approximate SVM", "Ensemble (All)",
+                 "Ensemble (Approximate SVM)"],
+        index=4,
         key="algorithm_selector"
     )
     
@@ -145,7 +229,9 @@ with col1:
         "Linear Regression": "linear_regression",
         "Random Forest": "random_forest",
         "SVM": "svm",
-        "Ensemble (All)": "ensemble"
+        "Approximate SVM": "svm_approx",
+        "Ensemble (All)": "ensemble",
+        "Ensemble (Approximate SVM)": "ensemble_approx"
     }
     
     st.session_state.selected_algorithm = algorithm_map[algorithm]
@@ -157,6 +243,10 @@ with col1:
         st.info("Random Forest uses multiple decision trees to make more accurate predictions with better handling of non-linear relationships.")
     elif algorithm == "SVM":
         st.info("Support Vector Machine (SVM) is effective for capturing complex patterns in market data that may not be visible with other algorithms.")
+    elif algorithm == "Approximate SVM":
+        st.info("Approximate SVM maps prices through Nyström kernel features and fits a linear model, so it trains in time linear in the history length.")
+    elif algorithm == "Ensemble (Approximate SVM)":
+        st.info("Combines Linear Regression, Random Forest and Approximate SVM, staying fast on long histories.")
     else:
         st.info("Ensemble combines predictions from multiple algorithms for a more robust forecast.")
 
@@ -176,31 +266,40 @@ with col2:
             st.metric("Change", f"{stock_data['change']:.2f}", delta=f"{stock_data['change']:.2f}")
         with ml_col:
             if st.button("Generate ML Insights", key="ml_insights_btn"):
-                with st.spinner(f"Analyzing {symbol} with {st.session_state.selected_algorithm} algorithm..."):
-                    # Get sentiment analysis and ML insights
-                    st.session_state.sentiment_data = get_stock_sentiment_summary(symbol)
+                # Get sentiment analysis and ML insights in the background; a job
+                # already running for this stock and algorithm is reused rather than restarted
+                algorithm_code = st.session_state.selected_algorithm
+                job = job_manager().submit(("insights", symbol, algorithm_code), get_stock_sentiment_summary, symbol,
+                                           algorithm_code, total_stages=len(SUMMARY_STAGES))
+                st.session_state.insight_job_id = job.id
+            
+            # Poll the insight job, if any
+            if st.session_state.insight_job_id is not None:
+                job = job_manager().status(st.session_state.insight_job_id)
+                if job is None:
+                    st.session_state.insight_job_id = None
+                elif job["status"] == "done":
+                    st.session_state.sentiment_data = job_manager().get(job["id"]).result
                     st.session_state.show_ml_insights = True
+                    st.session_state.insight_job_id = None
+                elif job["status"] == "failed":
+                    st.error(f"Error generating insights: {job['error']}")
+                    st.session_state.insight_job_id = None
+                else:
+                    running = [name for name, status in job["stages"].items() if status == "running"]
+                    stage_text = ", ".join(name.replace("_", " ") for name in running) or "starting"
+                    st.progress(job["progress"], text=f"Analyzing {symbol}: {stage_text}")
         
         # Get historical data
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=180)
-            historical_data = yf.download(symbol, start=start_date, end=end_date)
+            historical_data = load_history(*cache_key(symbol))
             
             if not historical_data.empty:
                 # Stock Chart
                 st.subheader("Historical Price Chart")
                 
-                # Create Plotly figure
-                fig = go.Figure()
-                fig.add_trace(go.Candlestick(
-                    x=historical_data.index,
-                    open=historical_data['Open'],
-                    high=historical_data['High'],
-                    low=historical_data['Low'],
-                    close=historical_data['Close'],
-                    name="Candlestick"
-                ))
+                # Plotly figure (cached; predictions are added to this copy)
+                fig = build_price_figure(*cache_key(symbol))
                 
                 # Add predictions if available
                 if st.session_state.show_ml_insights and st.session_state.sentiment_data:
@@ -219,23 +318,16 @@ with col2:
                                 y=pred_prices,
                                 mode='lines',
                                 line=dict(color='rgb(0, 200, 0)', width=2, dash='dash'),
-                                name=f"{st.session_state.selected_algorithm.replace('_', ' ').title()} Prediction"
+                                name=f"{sentiment_data['ml_predictions']['algorithm'].replace('_', ' ').title()} Prediction"
                             ))
                 
-                fig.update_layout(
-                    title=f"{symbol} Stock Price",
-                    xaxis_title="Date",
-                    yaxis_title="Price (USD)",
-                    height=500,
-                )
-                
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Technical indicators
                 st.subheader("Technical Indicators")
                 
                 # Calculate technical indicators
-                indicators = calculate_technical_indicators(historical_data)
+                indicators = load_indicators(*cache_key(symbol))
                 
                 indicator_cols = st.columns(3)
                 with indicator_cols[0]:
@@ -320,19 +412,28 @@ with col2:
                             # Create comparison table
                             algo_df = pd.DataFrame.from_dict(algo_data, orient='index')
                             
-                            # Sort by accuracy (highest first)
                             if not algo_df.empty and 'accuracy' in algo_df.columns:
-                                algo_df = algo_df.sort_values('accuracy', ascending=False)
-                                
-                                # Highlight the best algorithm
-                                st.markdown(f"**Best Algorithm:** {algo_df.index[0].replace('_', ' ').title()} (Accuracy: {algo_df['accuracy'].iloc[0]}%)")
+                                if 'horizon' not in algo_df.columns:
+                                    algo_df['horizon'] = 1
                                 
-                                # Format column names
-                                algo_df.columns = [col.upper() for col in algo_df.columns]
-                                algo_df.index = [idx.replace('_', ' ').title() for idx in algo_df.index]
-                                
-                                # Display table
-                                st.table(algo_df)
+                                # One table per forecast horizon, since errors
+                                # over different horizons are not comparable
+                                for horizon, horizon_df in algo_df.groupby('horizon'):
+                                    st.markdown("**One Day Ahead**" if horizon == 1
+                                                else f"**{int(horizon)}-Day Forecast**")
+                                    
+                                    # Sort by accuracy (highest first)
+                                    horizon_df = horizon_df.drop(columns='horizon').sort_values('accuracy', ascending=False)
+                                    
+                                    # Highlight the best algorithm
+                                    st.markdown(f"**Best Algorithm:** {horizon_df.index[0].replace('_', ' ').title()} (Accuracy: {horizon_df['accuracy'].iloc[0]}%)")
+                                    
+                                    # Format column names
+                                    horizon_df.columns = [col.upper() for col in horizon_df.columns]
+                                    horizon_df.index = [idx.replace('_', ' ').title() for idx in horizon_df.index]
+                                    
+                                    # Display table
+                                    st.table(horizon_df)
                                 
                                 # Add explanation
                                 st.markdown("""
@@ -365,3 +466,34 @@ with col2:
             st.error(f"Error loading historical data: {str(e)}")
     else:
         st.warning(f"Stock {symbol} not found. Please search for a valid stock symbol.")
+
+# Optional timing panel with the process-wide spans and counters
+if os.environ.get("SHOW_TIMING_PANEL", "").lower() in ("1", "true", "yes"):
+    with st.sidebar:
+        st.subheader("Timings")
+        snapshot = recorder.snapshot()
+        if snapshot['spans']:
+            timings = pd.DataFrame([
+                {"stage": name, "calls": s['count'], "total (s)": s['total'],
+                 "avg (s)": s['total'] / s['count'], "max (s)": s['max']}
+                for name, s in snapshot['spans'].items()
+            ]).sort_values("total (s)", ascending=False)
+            st.dataframe(timings, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No timings recorded yet")
+        
+        for name, value in sorted(snapshot['counters'].items()):
+            st.text(f"{name}: {value:,}")
+        if snapshot['peak_rss_bytes'] is not None:
+            st.text(f"peak RSS: {snapshot['peak_rss_bytes'] / 1e6:.1f} MB")
+        
+        st.download_button("Download metrics", PrometheusExporter().render(snapshot),
+                           file_name="metrics.prom", mime="text/plain")
+        if st.button("Reset timings"):
+            recorder.reset()
+            st.experimental_rerun()
+
+# Keep polling while an insight job is running; the page above is already rendered
+if st.session_state.insight_job_id is not None:
+    time.sleep(1)
+    st.experimental_rerun()
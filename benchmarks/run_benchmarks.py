@@ -0,0 +1,218 @@
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import sklearn
+from utils.synthetic import make_close_panel, make_headlines, make_ohlcv
+
+BENCHMARKS = []
+
+def benchmark(name, **params):
+    """Register a benchmark case for every combination of the parameter values
+
+    The decorated function does any setup for one case and returns a
+    zero-argument callable: the part that is timed.
+    """
+    def register(func):
+        for values in itertools.product(*params.values()):
+            BENCHMARKS.append((name, dict(zip(params, values)), func))
+        return func
+    return register
+
+@benchmark("map_function", days=[2520, 25200, 252000])
+def bench_map_function(days):
+    from utils.ml_algorithms import map_function
+    data = make_ohlcv(days)
+    return lambda: map_function(data)
+
+@benchmark("parallel_process_data", days=[25200, 1_000_000], chunks=[1, 2, 4, 8])
+def bench_parallel_process_data(days, chunks):
+    from utils.ml_algorithms import get_executor, parallel_process_data
+    data = make_ohlcv(days)
+    get_executor()  # pool start-up is a one-off cost, not part of each call
+    return lambda: parallel_process_data(data, n_chunks=chunks)
+
+@benchmark("train", days=[500, 2520, 10080],
+           algorithm=['linear_regression', 'random_forest', 'svm', 'svm_approx', 'ensemble'])
+def bench_train(days, algorithm):
+    from utils.ml_algorithms import StockPredictor
+    data = make_ohlcv(days)
+    predictor = StockPredictor('BENCH', algorithm)
+    return lambda: predictor.train(data)
+
+@benchmark("predict_next_day", horizon=[30, 250], algorithm=['linear_regression', 'ensemble'])
+def bench_predict_next_day(horizon, algorithm):
+    from utils.ml_algorithms import StockPredictor
+    data = make_ohlcv(500)
+    predictor = StockPredictor('BENCH', algorithm)
+    predictor.ensure_fitted(data)
+    return lambda: predictor.predict_next_day(data, days=horizon)
+
+@benchmark("compare_algorithm_performance", days=[500, 2520])
+def bench_compare_algorithm_performance(days):
+    from utils.ml_algorithms import compare_algorithm_performance
+    data = make_ohlcv(days)
+    return lambda: compare_algorithm_performance('BENCH', data=data)
+
+@benchmark("calculate_technical_indicators", days=[180, 2520])
+def bench_calculate_technical_indicators(days):
+    from utils.technical_indicators import calculate_technical_indicators
+    data = make_ohlcv(days)
+    return lambda: calculate_technical_indicators(data)
+
+@benchmark("streaming_indicators", bars=[2520])
+def bench_streaming_indicators(bars):
+    from utils.technical_indicators import StreamingIndicators
+    closes = make_ohlcv(bars)['Close'].to_numpy()
+
+    def run():
+        indicators = StreamingIndicators()
+        for close in closes:
+            indicators.update(close)
+    return run
+
+@benchmark("indicator_panel", days=[504], symbols=[100, 500])
+def bench_indicator_panel(days, symbols):
+    from utils.technical_indicators import calculate_indicator_panel
+    close = make_close_panel(days, symbols)
+    return lambda: calculate_indicator_panel(close)
+
+@benchmark("analyze_sentiment", headlines=[50, 500], batched=[False, True])
+def bench_analyze_sentiment(headlines, batched):
+    from utils.sentiment_analysis import analyze_sentiment, analyze_sentiment_batch
+    texts = make_headlines(headlines)
+    analyze_sentiment(texts[0])  # load the models outside the timed region
+    if batched:
+        return lambda: analyze_sentiment_batch(texts, use_cache=False)
+    return lambda: [analyze_sentiment_batch([text], use_cache=False)[0] for text in texts]
+
+def case_name(name, params):
+    return name + "[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+
+def _reason(e):
+    """One short line describing an exception"""
+    return f"{type(e).__name__}: {' '.join(str(e).split())[:120]}"
+
+def run_case(name, params, func, repeats):
+    """Time one case, returning its result entry
+
+    Cases whose optional dependencies are unavailable (an ImportError, or a
+    LookupError such as a missing NLTK resource) are skipped; any other
+    exception is recorded as an error.
+    """
+    try:
+        target = func(**params)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            target()
+            timings.append(time.perf_counter() - start)
+    except (ImportError, LookupError) as e:
+        return {'skipped': _reason(e)}
+    except Exception as e:
+        return {'error': _reason(e)}
+    return {
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'repeats': repeats
+    }
+
+def compare(results, baseline, threshold):
+    """Compare results against a baseline
+
+    Returns the cases whose median time regressed by more than
+    ``threshold``, and the cases that had a median in the baseline but no
+    longer produce one (now skipped or failing).
+    """
+    regressions = []
+    lost = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name, {})
+        if 'median' not in before:
+            continue
+        if 'median' not in result:
+            lost.append((name, result.get('error') or result.get('skipped')))
+            continue
+        ratio = result['median'] / before['median']
+        if ratio > 1 + threshold:
+            regressions.append((name, before['median'], result['median'], ratio))
+    return regressions, lost
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument('--filter', default=None, help="only run cases whose name contains this text")
+    parser.add_argument('--quick', action='store_true', help="only the smallest size of each parameter")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default=None, help="write results to this JSON file")
+    parser.add_argument('--baseline', default=None, help="compare against a saved results file")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="relative slowdown that counts as a regression (default 0.2)")
+    args = parser.parse_args()
+
+    cases = [
+        (name, params, func) for name, params, func in BENCHMARKS
+        if args.filter is None or args.filter in case_name(name, params)
+    ]
+    if args.quick:
+        smallest = {}
+        for name, params, func in BENCHMARKS:
+            smallest.setdefault(name, params)
+        cases = [(n, p, f) for n, p, f in cases if smallest[n] == p]
+
+    # Models and caches written during the run go to a scratch directory
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    os.chdir(tempfile.mkdtemp(prefix="stock-bench-"))
+
+    results = {}
+    for name, params, func in cases:
+        label = case_name(name, params)
+        result = run_case(name, params, func, args.repeats)
+        results[label] = result
+        if 'error' in result:
+            print(f"{label:<70} ERROR ({result['error']})")
+        elif 'skipped' in result:
+            print(f"{label:<70} skipped ({result['skipped']})")
+        else:
+            print(f"{label:<70} {result['median'] * 1000:10.2f} ms (min {result['min'] * 1000:.2f})")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count()
+        },
+        'results': results
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions, lost = compare(results, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms ({ratio:.2f}x)")
+        for name, reason in lost:
+            print(f"MISSING {name}: timed in the baseline but not now ({reason})")
+        if regressions or lost:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+    if any('error' in result for result in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+HEADLINES = [
+    "Shares rally after earnings beat expectations",
+    "Regulators open investigation into accounting practices",
+    "Company announces record quarterly revenue",
+    "Analysts downgrade stock citing slowing growth",
+    "New product launch receives mixed reviews",
+]
+
+def make_request(session, base_url, kind, symbols, days):
+    """Send one request of the given kind, returning (ok, seconds)"""
+    start = time.perf_counter()
+    if kind == 'predictions':
+        response = session.get(f"{base_url}/api/predictions/{random.choice(symbols)}",
+                               params={"days": days}, timeout=120)
+    elif kind == 'indicators':
+        response = session.get(f"{base_url}/api/indicators/{random.choice(symbols)}", timeout=120)
+    else:
+        response = session.post(f"{base_url}/api/sentiment",
+                                json={"texts": random.sample(HEADLINES, 2)}, timeout=120)
+    return response.ok, time.perf_counter() - start
+
+def run(base_url, kind, symbols, days, concurrency, duration):
+    """Hammer one endpoint from ``concurrency`` threads for ``duration`` seconds"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker():
+        nonlocal errors
+        session = requests.Session()
+        while time.perf_counter() < stop_at:
+            try:
+                ok, seconds = make_request(session, base_url, kind, symbols, days)
+            except requests.RequestException:
+                ok, seconds = False, 0.0
+            with lock:
+                if ok:
+                    latencies.append(seconds)
+                else:
+                    errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    print(f"{kind}: {len(latencies)} ok, {errors} errors in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed * 60:.0f} requests/min)")
+    if len(latencies):
+        p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+        print(f"  latency ms: p50={p50:.1f} p95={p95:.1f} p99={p99:.1f} max={latencies.max() * 1000:.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the prediction API")
+    parser.add_argument('--url', default="http://127.0.0.1:5000")
+    parser.add_argument('--endpoint', choices=['predictions', 'indicators', 'sentiment', 'all'], default='all')
+    parser.add_argument('--symbols', nargs='+', default=['AAPL', 'MSFT', 'GOOGL', 'AMZN'])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds per endpoint")
+    args = parser.parse_args()
+
+    # Warm up so model training and data downloads are not counted
+    session = requests.Session()
+    for symbol in args.symbols:
+        session.get(f"{args.url}/api/predictions/{symbol}", params={"days": args.days}, timeout=600)
+
+    kinds = ['predictions', 'indicators', 'sentiment'] if args.endpoint == 'all' else [args.endpoint]
+    for kind in kinds:
+        run(args.url, kind, args.symbols, args.days, args.concurrency, args.duration)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import pytest
+from utils.synthetic import make_ohlcv
+
+# Large-cap daily volumes, where unscaled features are badly conditioned
+LARGE_CAP_VOLUME = (50_000_000, 150_000_000)
+
+@pytest.fixture
+def make_prices():
+    """Factory for synthetic daily bars: make_prices(days, seed=0)"""
+    def make(days, seed=0):
+        return make_ohlcv(days, seed=seed, volume=LARGE_CAP_VOLUME)
+    return make
@@ -0,0 +1,64 @@
+import threading
+import pandas as pd
+import pytest
+import api
+
+@pytest.fixture
+def client():
+    return api.app.test_client()
+
+@pytest.mark.parametrize("symbol", ["..", "AAPL;rm", "A B", "$$$", "TOOLONGSYMBOLNAME"])
+def test_invalid_symbols_are_rejected(client, symbol):
+    for path in (f"/api/predictions/{symbol}", f"/api/indicators/{symbol}"):
+        response = client.get(path)
+        assert response.status_code == 400
+        assert response.get_json() == {"error": "Invalid ticker symbol"}
+
+@pytest.mark.parametrize("symbol", ["aapl", "BRK-B", "BF.B", "^GSPC", "EURUSD=X"])
+def test_ticker_pattern_accepts_yahoo_symbols(symbol):
+    assert api.SYMBOL_PATTERN.fullmatch(symbol.upper())
+
+def test_cold_fit_does_not_block_other_symbols(client, monkeypatch):
+    release = threading.Event()
+    history = pd.DataFrame({'Close': [1.0]}, index=pd.DatetimeIndex(['2024-01-02']))
+
+    def fit_models(symbol, algorithm, mode):
+        if symbol == "COLD":
+            release.wait(10)
+        return history, None
+
+    def get_ml_predictions(symbol, algorithm, days, data, mode, predictor):
+        return {'symbol': symbol, 'algorithm': algorithm, 'mode': mode,
+                'predictions': [{'date': data.index[-1], 'price': 1.0}] * days}
+
+    monkeypatch.setattr(api, 'fit_models', fit_models)
+    monkeypatch.setattr(api, 'get_ml_predictions', get_ml_predictions)
+    cold = threading.Thread(target=client.get, args=("/api/predictions/COLD",))
+    cold.start()
+    try:
+        response = client.get("/api/predictions/WARM?days=2")
+        assert response.status_code == 200
+        assert len(response.get_json()["predictions"]) == 2
+        assert cold.is_alive()
+    finally:
+        release.set()
+        cold.join()
+
+def test_batch_forecasts_groups_concurrently_with_pinned_predictors(monkeypatch):
+    both_started = threading.Barrier(2, timeout=10)
+    history = pd.DataFrame({'Close': [1.0]}, index=pd.DatetimeIndex(['2024-01-02']))
+    pinned = {"AAA": object(), "BBB": object()}
+
+    def get_ml_predictions(symbol, algorithm, days, data, mode, predictor):
+        assert predictor is pinned[symbol]
+        # Only returns if the other group's forecast is running at the same time
+        both_started.wait()
+        return {'symbol': symbol, 'predictions': list(range(days))}
+
+    monkeypatch.setattr(api, 'get_ml_predictions', get_ml_predictions)
+    results = api.predict_batch([
+        ("AAA", "ensemble", 3, "recursive", history, pinned["AAA"]),
+        ("BBB", "ensemble", 2, "recursive", history, pinned["BBB"]),
+        ("AAA", "ensemble", 5, "recursive", history, pinned["AAA"]),
+    ])
+    assert [result['predictions'] for result in results] == [[0, 1, 2], [0, 1], [0, 1, 2, 3, 4]]
@@ -0,0 +1,19 @@
+from benchmarks.run_benchmarks import compare, run_case
+
+def _raise(error):
+    def case():
+        raise error
+    return case
+
+def test_missing_dependencies_are_skipped_and_failures_are_errors():
+    assert 'skipped' in run_case('case', {}, _raise(ImportError("no torch")), 1)
+    assert 'skipped' in run_case('case', {}, _raise(LookupError("no lexicon")), 1)
+    assert 'error' in run_case('case', {}, _raise(ValueError("broken")), 1)
+    assert 'median' in run_case('case', {}, lambda: (lambda: None), 2)
+
+def test_compare_flags_regressions_and_lost_cases():
+    baseline = {'results': {'fast': {'median': 1.0}, 'gone': {'median': 1.0}, 'new': {'skipped': 'x'}}}
+    results = {'fast': {'median': 1.5}, 'gone': {'error': 'ValueError: broken'}, 'new': {'median': 1.0}}
+    regressions, lost = compare(results, baseline, 0.2)
+    assert [name for name, *_ in regressions] == ['fast']
+    assert lost == [('gone', 'ValueError: broken')]
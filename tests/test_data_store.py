@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from utils import data_store
+from utils.market_data import MarketDataProvider, set_provider
+from utils.synthetic import make_ohlcv
+
+class StubProvider(MarketDataProvider):
+    """Serves one fixed series for every symbol and records each price request"""
+    name = 'stub'
+
+    def __init__(self, bars, delay=0.0):
+        self.bars = bars
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get_prices(self, symbol, start, end):
+        with self._lock:
+            self.calls.append((symbol, pd.Timestamp(start), pd.Timestamp(end)))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return self.bars[(self.bars.index >= pd.Timestamp(start)) & (self.bars.index < pd.Timestamp(end))].copy()
+
+    def get_quote(self, symbol):
+        return None
+
+    def get_info(self, symbol):
+        return {}
+
+    def get_news(self, symbol):
+        return []
+
+@pytest.fixture
+def use_provider(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, 'CACHE_DIR', str(tmp_path))
+    def use(provider):
+        set_provider(provider)
+        return provider
+    yield use
+    set_provider(None)
+
+def assert_bars_equal(actual, expected):
+    """Same dates and values; the cache stores volumes as floats and dates in ns"""
+    np.testing.assert_array_equal(actual.index.values.astype('datetime64[ns]'),
+                                  expected.index.values.astype('datetime64[ns]'))
+    np.testing.assert_array_equal(actual.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+
+def history_through_today():
+    days = len(pd.bdate_range('2023-01-02', datetime.now()))
+    return make_ohlcv(days, start='2023-01-02')
+
+def test_backfill_and_top_up_download_only_missing_bars(use_provider):
+    provider = use_provider(StubProvider(make_ohlcv(500, start='2020-01-01')))
+    expected = provider.bars
+
+    first = data_store.get_price_history('abc', datetime(2020, 6, 1), datetime(2020, 9, 1))
+    assert_bars_equal(first, expected['2020-06-01':'2020-08-31'])
+
+    # Older start: only the gap before the cached range is downloaded
+    older = data_store.get_price_history('ABC', datetime(2020, 3, 1), datetime(2020, 9, 1))
+    assert provider.calls[-1][1:] == (pd.Timestamp('2020-03-01'), pd.Timestamp('2020-06-01'))
+    assert_bars_equal(older, expected['2020-03-01':'2020-08-31'])
+
+    # Later end: downloads from the last cached bar onwards
+    newer = data_store.get_price_history('ABC', datetime(2020, 3, 1), datetime(2020, 12, 1))
+    assert provider.calls[-1][1:] == (pd.Timestamp('2020-08-31'), pd.Timestamp('2020-12-01'))
+    assert_bars_equal(newer, expected['2020-03-01':'2020-11-30'])
+
+    # Anything inside the covered range is a cache hit
+    calls = len(provider.calls)
+    inner = data_store.get_price_history('ABC', datetime(2020, 4, 1), datetime(2020, 10, 1))
+    assert len(provider.calls) == calls
+    assert_bars_equal(inner, expected['2020-04-01':'2020-09-30'])
+
+def test_top_up_replaces_the_overlapping_bar(use_provider):
+    provider = use_provider(StubProvider(make_ohlcv(300, start='2020-01-01')))
+    data_store.get_price_history('ABC', datetime(2020, 1, 1), datetime(2020, 6, 1))
+
+    # The provider now reports a different (final) value for the last cached bar
+    provider.bars = provider.bars.copy()
+    provider.bars.loc['2020-05-29', 'Close'] = 1.0
+    history = data_store.get_price_history('ABC', datetime(2020, 1, 1), datetime(2020, 7, 1))
+    assert history.index.is_unique and history.index.is_monotonic_increasing
+    assert history.loc['2020-05-29', 'Close'] == 1.0
+    assert_bars_equal(history, provider.bars['2020-01-01':'2020-06-30'])
+
+def test_partial_bar_is_refetched_after_freshness_window(use_provider, tmp_path):
+    provider = use_provider(StubProvider(history_through_today()))
+    start = datetime.now() - timedelta(days=60)
+    data_store.get_price_history('ABC', start)
+    data_store.get_price_history('ABC', start)
+    assert len(provider.calls) == 1
+
+    provider.bars = provider.bars.copy()
+    provider.bars.iloc[-1, provider.bars.columns.get_loc('Close')] = 1.0
+    meta_path = tmp_path / 'stub' / 'ABC.json'
+    meta = json.loads(meta_path.read_text())
+    meta['fetched_at'] = (datetime.now() - data_store.FRESHNESS - timedelta(minutes=1)).isoformat()
+    meta_path.write_text(json.dumps(meta))
+
+    history = data_store.get_price_history('ABC', start)
+    assert len(provider.calls) == 2
+    assert history['Close'].iloc[-1] == 1.0
+
+def test_concurrent_requests_for_one_symbol_download_once(use_provider):
+    provider = use_provider(StubProvider(make_ohlcv(300, start='2020-01-01'), delay=0.05))
+    with ThreadPoolExecutor(max_workers=8) as threads:
+        results = list(threads.map(
+            lambda _: data_store.get_price_history('ABC', datetime(2020, 1, 1), datetime(2020, 6, 1)), range(8)))
+    assert len(provider.calls) == 1 and provider.max_in_flight == 1
+    for result in results[1:]:
+        pd.testing.assert_frame_equal(result, results[0])
+    assert_bars_equal(results[0], provider.bars['2020-01-01':'2020-05-31'])
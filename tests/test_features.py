@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from utils.ml_algorithms import LOOKBACK, get_executor, map_function, parallel_process_data, shutdown_executor
+
+def reference_features(data):
+    """The original one-row-at-a-time feature loop"""
+    X = []
+    for i in range(LOOKBACK, len(data)):
+        window = data['Close'].iloc[i - LOOKBACK:i]
+        X.append([data['Close'].iloc[i - j - 1] for j in range(LOOKBACK)]
+                 + [window.mean(), window.std(), data['Volume'].iloc[i - 1]])
+    return np.array(X).reshape(-1, LOOKBACK + 3), data['Close'].iloc[LOOKBACK:].values
+
+@pytest.mark.parametrize("days", [0, 1, LOOKBACK, LOOKBACK + 1, LOOKBACK + 2, 12, 300])
+def test_map_function_matches_reference_loop(days, make_prices):
+    data = make_prices(days)
+    X, y = map_function(data)
+    X_ref, y_ref = reference_features(data)
+    np.testing.assert_array_equal(X, X_ref)
+    np.testing.assert_array_equal(y, y_ref)
+
+def test_parallel_process_data_matches_serial_pass(make_prices):
+    data = make_prices(400, seed=1)
+    X_serial, y_serial = map_function(data)
+    for n_chunks in range(1, 51):
+        X, y = parallel_process_data(data, n_chunks=n_chunks)
+        np.testing.assert_array_equal(X, X_serial)
+        np.testing.assert_array_equal(y, y_serial)
+
+@pytest.mark.parametrize("days", [0, 3, LOOKBACK, LOOKBACK + 1, LOOKBACK + 3, 20])
+def test_short_inputs_with_more_chunks_than_rows(days, make_prices):
+    data = make_prices(days, seed=2)
+    X_serial, y_serial = map_function(data)
+    for n_chunks in (2, 4, 16):
+        X, y = parallel_process_data(data, n_chunks=n_chunks)
+        assert X.shape == (max(days - LOOKBACK, 0), LOOKBACK + 3)
+        np.testing.assert_array_equal(X, X_serial)
+        np.testing.assert_array_equal(y, y_serial)
+
+def test_concurrent_callers_share_one_pool():
+    shutdown_executor()
+    with ThreadPoolExecutor(max_workers=16) as threads:
+        pools = list(threads.map(lambda _: get_executor(), range(64)))
+    assert len({id(pool) for pool in pools}) == 1
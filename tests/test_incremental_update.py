@@ -0,0 +1,34 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import train_test_split
+from utils.ml_algorithms import StockPredictor, map_function
+
+def test_linear_update_matches_fresh_fit(tmp_path, make_prices):
+    data = make_prices(600)
+    initial, n_new = data.iloc[:-40], 40
+    predictor = StockPredictor('TEST', 'linear_regression', model_dir=str(tmp_path))
+    assert predictor.train(initial)
+    assert predictor.can_update(data) and predictor.update(data)
+
+    # Same rows as the update saw: the initial training split plus every new row
+    X_initial, y_initial = map_function(initial)
+    X_train, _, y_train, _ = train_test_split(X_initial, y_initial, test_size=0.2, random_state=42)
+    X_all, y_all = map_function(data)
+    X_rows = np.vstack([X_train, X_all[-n_new:]])
+    y_rows = np.concatenate([y_train, y_all[-n_new:]])
+
+    scale_X, scale_y = predictor.scaler_X, predictor.scaler_y
+    reference = LinearRegression().fit(scale_X.transform(X_rows),
+                                       scale_y.transform(y_rows.reshape(-1, 1)).ravel())
+    X_check = scale_X.transform(X_all)
+    np.testing.assert_allclose(predictor.linear_model.predict(X_check), reference.predict(X_check),
+                               rtol=0, atol=1e-8)
+
+def test_update_keeps_scalers(tmp_path, make_prices):
+    data = make_prices(600, seed=1)
+    predictor = StockPredictor('TEST', 'random_forest', model_dir=str(tmp_path))
+    assert predictor.train(data.iloc[:-40])
+    x_scale, y_scale = predictor.scaler_X.scale_.copy(), predictor.scaler_y.scale_.copy()
+    assert predictor.update(data)
+    np.testing.assert_array_equal(predictor.scaler_X.scale_, x_scale)
+    np.testing.assert_array_equal(predictor.scaler_y.scale_, y_scale)
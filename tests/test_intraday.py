@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from utils.intraday import build_feature_memmap, open_feature_memmap, train_from_memmap
+from utils.ml_algorithms import StockPredictor, extract_features
+
+def test_streamed_features_match_full_pass(tmp_path, make_prices):
+    make_prices(5000).to_csv(tmp_path / "bars.csv", index=False)
+    bars = pd.read_csv(tmp_path / "bars.csv")
+    X_full, y_full = extract_features(bars['Close'].values, bars['Volume'].values)
+    for chunksize in (3, 777, 5000):
+        build_feature_memmap(str(tmp_path / "bars.csv"), str(tmp_path / "features"), chunksize=chunksize)
+        X, y, meta = open_feature_memmap(str(tmp_path / "features"))
+        np.testing.assert_array_equal(X, X_full)
+        np.testing.assert_array_equal(y, y_full)
+
+def test_blockwise_linear_fit_matches_full_fit(tmp_path, make_prices):
+    make_prices(20000, seed=1).to_csv(tmp_path / "bars.csv", index=False)
+    build_feature_memmap(str(tmp_path / "bars.csv"), str(tmp_path / "features"))
+    X, y, meta = open_feature_memmap(str(tmp_path / "features"))
+    predictor = StockPredictor('TEST', 'linear_regression', model_dir=str(tmp_path / "models"))
+    assert train_from_memmap(predictor, X, y, meta, block_rows=3000)
+
+    X_scaled = predictor.scaler_X.transform(X)
+    y_scaled = predictor.scaler_y.transform(np.asarray(y).reshape(-1, 1)).ravel()
+    reference = LinearRegression().fit(X_scaled, y_scaled)
+    np.testing.assert_allclose(predictor.linear_model.predict(X_scaled), reference.predict(X_scaled),
+                               rtol=0, atol=1e-8)
@@ -0,0 +1,42 @@
+import time
+import tempfile
+import pytest
+from utils.ml_algorithms import DEFAULT_PARAMS
+from utils.model_selection import PARAM_GRID, _candidates, search_hyperparameters
+
+def test_defaults_are_not_evaluated_twice():
+    candidates = _candidates(('rf', 'svm', 'svm_approx'), PARAM_GRID)
+    assert len(candidates) == len({(name, tuple(sorted(params.items()))) for name, params in candidates})
+    # The rf defaults are one of the grid points once max_depth and min_samples_leaf are filled in
+    rf = [params for name, params in candidates if name == 'rf']
+    assert rf[0] == {**DEFAULT_PARAMS['rf'], 'max_depth': None, 'min_samples_leaf': 1}
+    assert len(rf) == len(PARAM_GRID['rf'])
+
+def test_search_picks_the_lowest_error_candidate(make_prices):
+    grid = {'svm_approx': [{'gamma': 0.1, 'n_components': 100, 'alpha': alpha} for alpha in (0.01, 1e6)]}
+    result = search_hyperparameters('TEST', data=make_prices(300), models=('svm_approx',), n_splits=3,
+                                    time_budget=120.0, grid=grid, save=False)
+    assert result['complete'] and result['evaluated'] == result['candidates'] == 3
+    scores = result['scores']['svm_approx']
+    assert [score['rmse'] for score in scores] == sorted(score['rmse'] for score in scores)
+    assert result['best']['svm_approx'] == scores[0]['params']
+    # Such a strong penalty flattens the forecast to the mean, far worse than the rest
+    assert result['best']['svm_approx']['alpha'] != 1e6
+    assert scores[-1]['params']['alpha'] == 1e6
+
+def test_search_returns_at_the_budget_without_waiting(make_prices, tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    # Each fold takes seconds, so some are still running at the deadline
+    grid = {'rf': [{'n_estimators': 3000 + i} for i in range(4)]}
+    result = search_hyperparameters('TEST', data=make_prices(1500), models=('rf',), n_splits=3,
+                                    time_budget=0.5, grid=grid, save=False)
+    assert not result['complete'] and result['evaluated'] < result['candidates']
+    assert result['best'] == {} or result['best']['rf'] == result['scores']['rf'][0]['params']
+
+    # The search did not wait for them: their memory-mapped inputs are
+    # still there, and are deleted once they finish
+    assert list(tmp_path.glob("model-selection-*"))
+    deadline = time.monotonic() + 120
+    while list(tmp_path.glob("model-selection-*")) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not list(tmp_path.glob("model-selection-*"))
@@ -0,0 +1,22 @@
+from utils.instrumentation import increment, recorder, span
+from utils.pipeline import Stage, run_stages
+
+def _square(value):
+    with span('test.square'):
+        increment('test.squared')
+        return value * value
+
+def _value():
+    return 3
+
+def test_worker_spans_are_merged_into_parent():
+    recorder.reset()
+    results = run_stages([
+        Stage('value', _value),
+        Stage('square', _square, deps=['value'], cpu_bound=True),
+    ])
+    assert results == {'value': 3, 'square': 9}
+    snapshot = recorder.snapshot()
+    assert snapshot['spans']['test.square']['count'] == 1
+    assert snapshot['counters']['test.squared'] == 1
+    assert snapshot['spans']['stage.square']['count'] == 1
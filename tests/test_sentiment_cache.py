@@ -0,0 +1,32 @@
+import pytest
+import utils.sentiment_analysis as sentiment_analysis
+from utils.sentiment_cache import SentimentCache, text_key
+
+def _fail(*args, **kwargs):
+    raise AssertionError("model loaded on a cache hit")
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = SentimentCache(str(tmp_path / "sentiment.sqlite"))
+    monkeypatch.setattr(sentiment_analysis, 'sentiment_cache', cache)
+    return cache
+
+def test_cache_hits_do_not_load_models(cache, monkeypatch):
+    score = {"vader": {"compound": 0.5}, "transformer": {"label": "POSITIVE", "score": 0.9}}
+    version = sentiment_analysis.sentiment_model_version()
+    cache.put_many({text_key("Shares rally", version): score})
+    monkeypatch.setattr(sentiment_analysis, 'get_sentiment_pipeline', _fail)
+    monkeypatch.setattr(sentiment_analysis, 'get_vader', _fail)
+
+    assert sentiment_analysis.analyze_sentiment_batch(["Shares  rally", "Shares rally"]) == [score, score]
+
+def test_scores_without_transformer_are_not_cached(cache, monkeypatch):
+    class Vader:
+        def polarity_scores(self, text):
+            return {"compound": 0.1}
+    monkeypatch.setattr(sentiment_analysis, 'get_vader', Vader)
+    monkeypatch.setattr(sentiment_analysis, 'get_sentiment_pipeline', lambda: None)
+
+    result = sentiment_analysis.analyze_sentiment_batch(["Shares slump"])
+    assert result == [{"vader": {"compound": 0.1}, "transformer": None}]
+    assert cache.get_many([text_key("Shares slump", sentiment_analysis.sentiment_model_version())]) == {}
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.synthetic import make_close_panel, make_ohlcv
+from utils.technical_indicators import (
+    PANEL_INDICATORS, StreamingIndicators, calculate_indicator_panel, calculate_technical_indicators, screen
+)
+
+def assert_indicators_equal(streamed, batch):
+    assert streamed.keys() == batch.keys()
+    for name in batch:
+        assert streamed[name] == pytest.approx(batch[name], rel=1e-9, abs=1e-9), name
+
+@pytest.mark.parametrize("data", [
+    make_ohlcv(260, seed=4),
+    # Flat, then only rising: RSI with no losses, Bollinger width of zero
+    pd.DataFrame({'Close': [100.0] * 30 + list(100.0 + np.arange(1, 31))}),
+])
+def test_streaming_matches_batch_after_every_bar(data):
+    indicators = StreamingIndicators()
+    for end in range(1, len(data) + 1):
+        streamed = indicators.update(data['Close'].iloc[end - 1])
+        assert_indicators_equal(streamed, calculate_technical_indicators(data.iloc[:end]))
+
+def test_revising_the_current_bar_matches_batch():
+    data = make_ohlcv(230, seed=5)
+    indicators = StreamingIndicators.from_history(data.iloc[:-1])
+    rng = np.random.default_rng(0)
+    last = data['Close'].iloc[-2]
+    indicators.update(last)
+    # Intraday ticks revise today's close; the batch sees only the latest one
+    for tick in last * np.exp(rng.normal(0, 0.01, 20)):
+        streamed = indicators.update(tick, new_bar=False)
+        closes = data['Close'].iloc[:-1].tolist() + [tick]
+        assert_indicators_equal(streamed, calculate_technical_indicators(pd.DataFrame({'Close': closes})))
+
+def test_panel_columns_match_single_symbol_function():
+    close = make_close_panel(320, 12, seed=6)
+    panel = calculate_indicator_panel(close)
+    for column in range(close.shape[1]):
+        listed = close[:, column]
+        for t in (199, 250, len(close) - 1):
+            history = listed[:t + 1]
+            expected = calculate_technical_indicators(pd.DataFrame({'Close': history[~np.isnan(history)]}))
+            for name in PANEL_INDICATORS:
+                value = panel[name][t, column]
+                assert (0 if np.isnan(value) else value) == pytest.approx(expected[name], rel=1e-9, abs=1e-9), \
+                    (name, column, t)
+
+def test_panel_float32_output():
+    panel = calculate_indicator_panel(make_close_panel(250, 5), dtype=np.float32)
+    assert all(values.dtype == np.float32 for values in panel.values())
+
+def test_screen_filters_and_ranks():
+    panel = {
+        "close": np.array([[10.0, 20.0, 30.0, np.nan]]),
+        "RSI": np.array([[25.0, 45.0, 15.0, 10.0]]),
+        "SMA_200": np.array([[9.0, 25.0, 20.0, 5.0]]),
+    }
+    symbols = ["AAA", "BBB", "CCC", "DDD"]
+    assert screen(panel, "RSI < 30 and close > SMA_200", symbols) == ["AAA", "CCC"]
+    assert screen(panel, "rsi < 20 or close < SMA_200", symbols) == ["BBB", "CCC", "DDD"]
+    assert screen(panel, "RSI < 50", symbols, sort_by="RSI") == ["DDD", "CCC", "AAA", "BBB"]
+    assert screen(panel, "RSI < 50 and close > 0", symbols, sort_by="close", descending=True) == ["CCC", "BBB", "AAA"]
+    assert screen(panel, "RSI < 30").tolist() == [True, False, True, True]
+    with pytest.raises(ValueError):
+        screen(panel, "VOLUME > 1", symbols)
@@ -0,0 +1,147 @@
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from utils.data_store import get_price_history
+from utils.ml_algorithms import ALGORITHM_MODELS, StockPredictor
+
+def fetch_universe(symbols, years=2, max_threads=8):
+    """Fetch historical data for many symbols concurrently through the price cache"""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=365 * years)
+
+    def fetch(symbol):
+        try:
+            return symbol, get_price_history(symbol, start_date, end_date)
+        except Exception as e:
+            print(f"Error fetching data for {symbol}: {e}")
+            return symbol, None
+
+    histories = {}
+    with ThreadPoolExecutor(max_workers=max_threads) as executor:
+        for symbol, history in executor.map(fetch, symbols):
+            if history is not None and not history.empty:
+                histories[symbol] = history
+    return histories
+
+def train_symbol(symbol, algorithm, data, incremental=False):
+    """Train and save the models for one symbol, reporting how it went"""
+    start = time.perf_counter()
+    result = {'symbol': symbol, 'rows': len(data)}
+    try:
+        predictor = StockPredictor(symbol, algorithm)
+        if incremental:
+            # Fold new bars into the saved models, retraining only if they can't be updated
+            ok = predictor.ensure_fitted(data)
+        else:
+            # Feature building stays in-process: the workers already use every core
+            ok = predictor.train(data, n_chunks=1)
+        result['status'] = 'trained' if ok else 'failed'
+        if not ok:
+            result['error'] = 'training failed'
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+
+    result['seconds'] = round(time.perf_counter() - start, 4)
+    result['rows_per_second'] = round(result['rows'] / result['seconds'], 1) if result['seconds'] else None
+    return result
+
+def iter_train_universe(symbols, algorithm='ensemble', years=2, max_workers=None, incremental=False):
+    """Train models for a list of symbols across worker processes
+
+    Yields one result dict per symbol as soon as its models have been
+    written to ``models/<symbol>/``, in completion order.
+    """
+    symbols = list(dict.fromkeys(s.upper() for s in symbols))
+    histories = fetch_universe(symbols, years=years)
+
+    for symbol in symbols:
+        if symbol not in histories:
+            yield {'symbol': symbol, 'rows': 0, 'status': 'failed',
+                   'error': 'no data found', 'seconds': 0.0, 'rows_per_second': None}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(train_symbol, symbol, algorithm, data, incremental): symbol
+            for symbol, data in histories.items()
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                # The worker itself died (e.g. out of memory)
+                yield {'symbol': symbol, 'rows': len(histories[symbol]), 'status': 'failed',
+                       'error': str(e), 'seconds': 0.0, 'rows_per_second': None}
+
+def train_universe(symbols, algorithm='ensemble', years=2, max_workers=None, callback=None,
+                   incremental=False):
+    """
+    Train models for a whole watchlist and summarize throughput and failures
+
+    Parameters:
+    -----------
+    symbols : list of str
+        Stock ticker symbols
+    algorithm : str
+        Algorithm to use (a key of ALGORITHM_MODELS)
+    years : int
+        Years of history to train on
+    max_workers : int
+        Number of local worker processes (defaults to the number of cores)
+    callback : callable
+        Called with each per-symbol result as soon as it finishes
+    incremental : bool
+        Update existing models with new bars instead of retraining from scratch
+    """
+    start = time.perf_counter()
+    results = []
+    for result in iter_train_universe(symbols, algorithm, years, max_workers, incremental):
+        results.append(result)
+        if callback is not None:
+            callback(result)
+    elapsed = time.perf_counter() - start
+
+    trained = [r for r in results if r['status'] == 'trained']
+    return {
+        'algorithm': algorithm,
+        'results': results,
+        'trained': len(trained),
+        'failed': {r['symbol']: r.get('error', '') for r in results if r['status'] != 'trained'},
+        'seconds': round(elapsed, 4),
+        'symbols_per_second': round(len(trained) / elapsed, 3) if elapsed else None,
+        'rows_per_second': round(sum(r['rows'] for r in trained) / elapsed, 1) if elapsed else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Train prediction models for a list of symbols")
+    parser.add_argument('symbols', nargs='+', help="ticker symbols, or a path to a file with one per line")
+    parser.add_argument('--algorithm', default='ensemble',
+                        choices=sorted(ALGORITHM_MODELS))
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--incremental', action='store_true',
+                        help="update existing models with new bars instead of retraining")
+    args = parser.parse_args()
+
+    symbols = args.symbols
+    if len(symbols) == 1 and os.path.isfile(symbols[0]):
+        with open(symbols[0]) as f:
+            symbols = [line.strip() for line in f if line.strip()]
+
+    def report(result):
+        if result['status'] == 'trained':
+            print(f"{result['symbol']}: trained on {result['rows']} rows in {result['seconds']:.2f}s")
+        else:
+            print(f"{result['symbol']}: FAILED ({result.get('error', '')})")
+
+    summary = train_universe(symbols, args.algorithm, args.years, args.workers, callback=report,
+                             incremental=args.incremental)
+    print(f"Trained {summary['trained']}/{len(summary['results'])} symbols in {summary['seconds']:.2f}s "
+          f"({summary['symbols_per_second']} symbols/s)")
+
+if __name__ == "__main__":
+    main()
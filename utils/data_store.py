@@ -0,0 +1,184 @@
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from utils.instrumentation import increment, span
+from utils.market_data import COLUMNS, get_provider
+
+# On-disk OHLCV cache: one memory-mapped .npy file of daily bars per symbol,
+# plus a small JSON sidecar recording which date range has been downloaded
+# and when. Providers other than Yahoo cache into their own subdirectory.
+CACHE_DIR = os.environ.get('PRICE_CACHE_DIR', os.path.join('data', 'prices'))
+
+# A bar downloaded during its own trading day may still be changing; it is
+# downloaded again once the cached copy is older than this
+FRESHNESS = timedelta(minutes=15)
+
+BAR_DTYPE = np.dtype([('date', 'i8')] + [(col, 'f8') for col in COLUMNS])
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+def _symbol_lock(symbol):
+    """Serialize cache updates for one symbol within this process"""
+    with _locks_guard:
+        return _locks.setdefault(symbol, threading.Lock())
+
+def _cache_dir():
+    name = get_provider().name
+    return CACHE_DIR if name == 'yahoo' else os.path.join(CACHE_DIR, name)
+
+def _bars_path(symbol):
+    return os.path.join(_cache_dir(), f"{symbol}.npy")
+
+def _meta_path(symbol):
+    return os.path.join(_cache_dir(), f"{symbol}.json")
+
+def _load_bars(symbol):
+    """Memory-map the cached bars for a symbol (empty array if none)"""
+    path = _bars_path(symbol)
+    if not os.path.exists(path):
+        return np.empty(0, dtype=BAR_DTYPE)
+    return np.load(path, mmap_mode='r')
+
+def _load_meta(symbol):
+    path = _meta_path(symbol)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _save(symbol, bars, meta):
+    """Atomically replace the cached bars and metadata for a symbol"""
+    os.makedirs(_cache_dir(), exist_ok=True)
+    # np.save appends .npy when missing, so keep the suffix on the temp file
+    tmp_bars = _bars_path(symbol)[:-len('.npy')] + f".{os.getpid()}.tmp.npy"
+    np.save(tmp_bars, bars)
+    os.replace(tmp_bars, _bars_path(symbol))
+
+    tmp_meta = _meta_path(symbol) + f".{os.getpid()}.tmp"
+    with open(tmp_meta, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, _meta_path(symbol))
+
+def _to_bars(frame):
+    bars = np.empty(len(frame), dtype=BAR_DTYPE)
+    bars['date'] = frame.index.values.astype('datetime64[ns]').astype('i8')
+    for col in COLUMNS:
+        bars[col] = frame[col].to_numpy(dtype=np.float64) if col in frame.columns else np.nan
+    return bars
+
+def _to_frame(bars):
+    frame = pd.DataFrame({col: np.array(bars[col]) for col in COLUMNS},
+                         index=pd.DatetimeIndex(np.array(bars['date']).astype('datetime64[ns]'), name='Date'))
+    return frame
+
+def _meta(start, fetched_through, fetched_at):
+    return {'start': str(start.date()), 'fetched_through': str(fetched_through.date()),
+            'fetched_at': fetched_at.isoformat(timespec='seconds')}
+
+def _last_bar_stale(meta, now):
+    """Whether the last cached bar was fetched mid-day and is past FRESHNESS"""
+    fetched_through = pd.Timestamp(meta['fetched_through'])
+    # Caches written before fetched_at was recorded count as fetched mid-day
+    fetched_at = pd.Timestamp(meta.get('fetched_at', meta['fetched_through']))
+    return fetched_at < fetched_through + pd.Timedelta(days=1) and now - fetched_at > FRESHNESS
+
+def _merge(old, new):
+    """Combine two bar arrays, preferring ``new`` where dates overlap"""
+    combined = np.concatenate([new, old])
+    _, first = np.unique(combined['date'], return_index=True)
+    return combined[first]
+
+def _download(symbol, start, end):
+    with span('price_cache.download'):
+        data = get_provider().get_prices(symbol, start, end)
+    increment('price_cache.downloads')
+    if data.empty:
+        return np.empty(0, dtype=BAR_DTYPE)
+    bars = _to_bars(data)
+    increment('price_cache.bytes_fetched', bars.nbytes)
+    return bars
+
+def get_price_history(symbol, start, end=None):
+    """
+    Get daily OHLCV bars for a symbol, downloading only what is not cached
+
+    Parameters:
+    -----------
+    symbol : str
+        Stock ticker symbol
+    start : datetime
+        First date to include
+    end : datetime
+        Date to stop before (defaults to now)
+
+    Returns a DataFrame indexed by date with Open, High, Low, Close and
+    Volume columns (empty if no data is available).
+    """
+    symbol = symbol.upper()
+    now = datetime.now()
+    end = end or now
+    start_day = pd.Timestamp(start).normalize()
+    end_day = pd.Timestamp(end).normalize()
+
+    with _symbol_lock(symbol):
+        bars = _load_bars(symbol)
+        meta = _load_meta(symbol) if len(bars) else None
+
+        if meta is None:
+            bars = _download(symbol, start_day, end)
+            if len(bars):
+                _save(symbol, bars, _meta(start_day, end_day, now))
+        else:
+            covered_start = pd.Timestamp(meta['start'])
+            fetched_through = pd.Timestamp(meta['fetched_through'])
+            fetched_at = pd.Timestamp(meta.get('fetched_at', meta['fetched_through']))
+            updated = False
+
+            if start_day < covered_start:
+                # Backfill history older than anything requested before
+                older = _download(symbol, start_day, covered_start)
+                bars = _merge(bars, older)
+                covered_start = start_day
+                updated = True
+
+            if end_day > fetched_through or (end_day == fetched_through and _last_bar_stale(meta, now)):
+                # Top up from the last cached bar, which may have been partial
+                last_date = pd.Timestamp(int(bars['date'][-1]))
+                newer = _download(symbol, last_date, end)
+                bars = _merge(bars, newer)
+                fetched_through, fetched_at = end_day, pd.Timestamp(now)
+                updated = True
+
+            if not updated:
+                increment('price_cache.hits')
+            else:
+                _save(symbol, np.asarray(bars), _meta(covered_start, fetched_through, fetched_at))
+
+    dates = np.asarray(bars['date'])
+    lo = np.searchsorted(dates, start_day.value, side='left')
+    hi = np.searchsorted(dates, pd.Timestamp(end).value, side='left')
+    return _to_frame(bars[lo:hi])
+
+def get_recent_history(symbol, days):
+    """Get the last ``days`` calendar days of daily bars for a symbol"""
+    end_date = datetime.now()
+    return get_price_history(symbol, end_date - timedelta(days=days), end_date)
+
+def clear_cache(symbol=None):
+    """Delete the cached bars for one symbol, or for every symbol"""
+    cache_dir = _cache_dir()
+    if not os.path.isdir(cache_dir):
+        return
+    if symbol is None:
+        names = os.listdir(cache_dir)
+    else:
+        names = [f"{symbol.upper()}.npy", f"{symbol.upper()}.json"]
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        if os.path.isfile(path):
+            os.remove(path)
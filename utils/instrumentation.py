@@ -0,0 +1,170 @@
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Process-wide timing spans and counters for the prediction and sentiment
+# pipelines. Spans aggregate count / total / max seconds per stage name;
+# counters accumulate things like cache hits, bytes fetched and rows
+# processed. Worker processes have recorders of their own: pipeline stages
+# drain theirs after each task and the parent merges what they recorded.
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class Recorder:
+    """Thread-safe store of timing spans and counters"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._counters = {}
+
+    def record(self, name, seconds):
+        """Add one timing observation for a span"""
+        with self._lock:
+            span = self._spans.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0})
+            span['count'] += 1
+            span['total'] += seconds
+            span['max'] = max(span['max'], seconds)
+            span['last'] = seconds
+
+    def increment(self, name, amount=1):
+        """Add to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    @contextmanager
+    def span(self, name):
+        """Time the enclosed block under ``name``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Copy of the current spans, counters and peak memory"""
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'spans': {name: dict(span) for name, span in self._spans.items()},
+                'counters': dict(self._counters),
+                'peak_rss_bytes': peak_rss_bytes()
+            }
+
+    def drain(self):
+        """Return the spans and counters recorded so far, clearing them"""
+        with self._lock:
+            recorded = {'spans': self._spans, 'counters': self._counters}
+            self._spans = {}
+            self._counters = {}
+            return recorded
+    
+    def merge(self, recorded):
+        """Add spans and counters drained from another recorder (e.g. a worker process's)"""
+        with self._lock:
+            for name, other in recorded['spans'].items():
+                span = self._spans.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0})
+                span['count'] += other['count']
+                span['total'] += other['total']
+                span['max'] = max(span['max'], other['max'])
+                span['last'] = other['last']
+            for name, value in recorded['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+    
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+recorder = Recorder()
+span = recorder.span
+increment = recorder.increment
+
+def timed(name):
+    """Decorator recording each call of a function as a span"""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with recorder.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class LogExporter:
+    """Print a human-readable summary (or send it to a logger's info method)"""
+    def __init__(self, log=print):
+        self.log = log
+
+    def export(self, snapshot):
+        for name, s in sorted(snapshot['spans'].items()):
+            self.log(f"{name}: {s['count']} calls, {s['total']:.3f}s total, "
+                     f"{s['total'] / s['count']:.4f}s avg, {s['max']:.4f}s max")
+        for name, value in sorted(snapshot['counters'].items()):
+            self.log(f"{name}: {value}")
+        if snapshot['peak_rss_bytes'] is not None:
+            self.log(f"peak_rss: {snapshot['peak_rss_bytes'] / 1e6:.1f} MB")
+
+class JsonFileExporter:
+    """Write each snapshot to a JSON file"""
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, snapshot):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(snapshot, f, indent=2)
+
+class PrometheusExporter:
+    """Render snapshots in the Prometheus text exposition format"""
+    def __init__(self, path=None, prefix='stock_tracker'):
+        self.path = path
+        self.prefix = prefix
+
+    def _metric(self, name):
+        return f"{self.prefix}_" + "".join(c if c.isalnum() else '_' for c in name)
+
+    def render(self, snapshot):
+        lines = []
+        spans = sorted(snapshot['spans'].items())
+        for family, kind, field, fmt in (('span_seconds_total', 'counter', 'total', '.6f'),
+                                         ('span_calls_total', 'counter', 'count', 'd'),
+                                         ('span_seconds_max', 'gauge', 'max', '.6f')):
+            lines.append(f"# TYPE {self.prefix}_{family} {kind}")
+            for name, s in spans:
+                lines.append(f'{self.prefix}_{family}{{span="{name}"}} {s[field]:{fmt}}')
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = self._metric(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        if snapshot['peak_rss_bytes'] is not None:
+            lines.append(f"# TYPE {self.prefix}_peak_rss_bytes gauge")
+            lines.append(f"{self.prefix}_peak_rss_bytes {snapshot['peak_rss_bytes']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, snapshot):
+        text = self.render(snapshot)
+        if self.path:
+            with open(self.path, 'w') as f:
+                f.write(text)
+        return text
+
+def export_metrics(exporter):
+    """Send the current snapshot to an exporter"""
+    return exporter.export(recorder.snapshot())
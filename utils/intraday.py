@@ -0,0 +1,208 @@
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from utils.instrumentation import increment, peak_rss_bytes, span, timed
+from utils.ml_algorithms import (
+    ALGORITHM_MODELS, LOOKBACK, StockPredictor, extract_features, linear_statistics, make_model
+)
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # parquet input is optional
+    pq = None
+
+# Out-of-core path for long intraday histories (e.g. years of 1-minute bars):
+# bars are streamed from disk in chunks, features are appended to raw files
+# that are then memory-mapped, and the models are fitted from those files.
+# Peak memory depends on the chunk sizes, not on the length of the history.
+
+FEATURE_DIR = os.environ.get('FEATURE_DIR', os.path.join('data', 'features'))
+
+# Bars read per chunk, and feature rows per pass when fitting scalers and
+# the linear model
+CHUNK_ROWS = 500_000
+BLOCK_ROWS = 1_000_000
+
+# Most recent rows used to fit the models that need all their data in
+# memory; the exact SVR gets a smaller window since it scales quadratically
+RECENT_ROWS = 100_000
+SVR_ROWS = 20_000
+
+def iter_bar_chunks(path, chunksize=CHUNK_ROWS, time_column=None):
+    """
+    Stream (close, volume, last_time) chunks from a CSV or Parquet file of bars
+
+    Only the Close and Volume columns (plus ``time_column``, if given) are
+    read. Parquet files are read batch by batch and need pyarrow.
+    """
+    columns = ['Close', 'Volume'] + ([time_column] if time_column else [])
+    if path.endswith('.parquet'):
+        if pq is None:
+            raise ImportError("Reading parquet bars requires pyarrow (pip install pyarrow)")
+        batches = (batch.to_pandas() for batch in
+                   pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns))
+    else:
+        batches = pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+    for frame in batches:
+        last_time = str(frame[time_column].iloc[-1]) if time_column and len(frame) else None
+        yield (frame['Close'].to_numpy(dtype=np.float64),
+               frame['Volume'].to_numpy(dtype=np.float64),
+               last_time)
+
+def _feature_paths(out_dir):
+    return (os.path.join(out_dir, "X.f8"), os.path.join(out_dir, "y.f8"),
+            os.path.join(out_dir, "features.json"))
+
+@timed('intraday.build_features')
+def build_feature_memmap(path, out_dir, chunksize=CHUNK_ROWS, time_column=None):
+    """
+    Build the map_function features for a bar file without loading it whole
+
+    Each chunk is prefixed with the last LOOKBACK bars of the one before,
+    so rows spanning a chunk boundary are identical to those built from the
+    full history. Rows are appended to raw float64 files in ``out_dir``
+    (``X.f8``, ``y.f8``) next to a ``features.json`` describing them.
+
+    Returns the description: rows, columns, source file and a fingerprint
+    (a hash of every close and volume, plus the last timestamp if
+    ``time_column`` is given).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    X_path, y_path, meta_path = _feature_paths(out_dir)
+    digest = hashlib.sha1()
+    carry_close = np.empty(0)
+    carry_volume = np.empty(0)
+    rows = bars = 0
+    data_end = None
+
+    with open(X_path + ".tmp", 'wb') as X_file, open(y_path + ".tmp", 'wb') as y_file:
+        for close, volume, last_time in iter_bar_chunks(path, chunksize, time_column):
+            digest.update(close.tobytes())
+            digest.update(volume.tobytes())
+            bars += len(close)
+            data_end = last_time or data_end
+
+            close = np.concatenate([carry_close, close])
+            volume = np.concatenate([carry_volume, volume])
+            X, y = extract_features(close, volume)
+            X.tofile(X_file)
+            y.tofile(y_file)
+            rows += len(y)
+            carry_close, carry_volume = close[-LOOKBACK:], volume[-LOOKBACK:]
+
+    os.replace(X_path + ".tmp", X_path)
+    os.replace(y_path + ".tmp", y_path)
+    increment('intraday.bars_ingested', bars)
+
+    meta = {
+        'source': os.path.abspath(path),
+        'rows': rows,
+        'columns': LOOKBACK + 3,
+        'data_end': data_end,
+        'data_hash': digest.hexdigest()
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+def open_feature_memmap(out_dir):
+    """Memory-map the features written by build_feature_memmap, returning (X, y, meta)"""
+    X_path, y_path, meta_path = _feature_paths(out_dir)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta['rows'] == 0:
+        return np.empty((0, meta['columns'])), np.empty(0), meta
+    X = np.memmap(X_path, dtype=np.float64, mode='r', shape=(meta['rows'], meta['columns']))
+    y = np.memmap(y_path, dtype=np.float64, mode='r', shape=(meta['rows'],))
+    return X, y, meta
+
+def train_from_memmap(predictor, X, y, meta, block_rows=BLOCK_ROWS, recent_rows=RECENT_ROWS):
+    """
+    Fit a predictor's models from memory-mapped features and save their bundle
+
+    The scalers are accumulated block by block over every row, and the
+    linear model's QR factor is then built the same way from rows
+    standardized by them, so the linear model is the least-squares fit on
+    the whole history. The random forest and approximate SVR are fitted on
+    the most recent ``recent_rows`` rows, and the exact SVR on the last
+    SVR_ROWS.
+    """
+    n_rows = len(y)
+    if n_rows < 10:
+        return False
+    names = ALGORITHM_MODELS[predictor.algorithm]
+
+    with span('intraday.scale'):
+        for start in range(0, n_rows, block_rows):
+            predictor.scaler_X.partial_fit(X[start:start + block_rows])
+            predictor.scaler_y.partial_fit(np.asarray(y[start:start + block_rows]).reshape(-1, 1))
+
+    if 'linear' in names:
+        with span('predictor.fit.linear'):
+            stats = None
+            reference = predictor._scaler_reference()
+            for start in range(0, n_rows, block_rows):
+                stats = linear_statistics(np.asarray(X[start:start + block_rows]),
+                                          np.asarray(y[start:start + block_rows]), reference, stats)
+            predictor.linear_stats = stats
+            predictor._solve_linear()
+
+    for name in ('rf', 'svm', 'svm_approx'):
+        if name not in names:
+            continue
+        window = min(recent_rows, SVR_ROWS) if name == 'svm' else recent_rows
+        X_recent = predictor.scaler_X.transform(X[-window:])
+        y_recent = predictor.scaler_y.transform(np.asarray(y[-window:]).reshape(-1, 1)).ravel()
+        model = make_model(name, predictor.params[name], n_samples=len(y_recent))
+        with span(f'predictor.fit.{name}'):
+            model.fit(X_recent, y_recent)
+        setattr(predictor, f"{name}_model", model)
+
+    increment('predictor.rows_processed', n_rows)
+    predictor._save({'data_end': meta['data_end'], 'data_hash': meta['data_hash'], 'rows': n_rows}, names)
+    return True
+
+def train_intraday(symbol, path, algorithm='ensemble_approx', chunksize=CHUNK_ROWS, time_column=None,
+                   feature_dir=None, model_dir=None):
+    """
+    Build features from an intraday bar file and train a predictor on them
+
+    Features go to ``data/features/<symbol>`` and models to
+    ``models/<symbol>/intraday``, apart from the daily ones. Returns the
+    trained predictor, or None if training failed.
+    """
+    feature_dir = feature_dir or os.path.join(FEATURE_DIR, symbol)
+    predictor = StockPredictor(symbol, algorithm,
+                               model_dir=model_dir or os.path.join('models', symbol, 'intraday'))
+    build_feature_memmap(path, feature_dir, chunksize, time_column)
+    X, y, meta = open_feature_memmap(feature_dir)
+    with span('intraday.train'):
+        return predictor if train_from_memmap(predictor, X, y, meta) else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Train on an intraday bar file without loading it into memory")
+    parser.add_argument('symbol')
+    parser.add_argument('path', help="CSV or Parquet file with Close and Volume columns")
+    parser.add_argument('--algorithm', default='ensemble_approx', choices=sorted(ALGORITHM_MODELS))
+    parser.add_argument('--chunksize', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--time-column', default=None, help="timestamp column recorded as the data end")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    predictor = train_intraday(args.symbol.upper(), args.path, args.algorithm, args.chunksize, args.time_column)
+    if predictor is None:
+        print(f"{args.symbol.upper()}: training failed")
+        return
+    peak = peak_rss_bytes()
+    print(f"{args.symbol.upper()}: trained {args.algorithm} on {predictor.metadata['rows']} rows "
+          f"in {time.perf_counter() - start:.1f}s"
+          + (f", peak RSS {peak / 1e6:.0f} MB" if peak is not None else ""))
+
+if __name__ == "__main__":
+    main()
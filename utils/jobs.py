@@ -0,0 +1,130 @@
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class Job:
+    """A unit of background work with per-stage progress"""
+    def __init__(self, job_id, key, total_stages=None):
+        self.id = job_id
+        self.key = key
+        self.total_stages = total_stages
+        self.status = 'pending'
+        self.stages = OrderedDict()
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    @property
+    def progress(self):
+        """Fraction of stages finished, between 0 and 1"""
+        if self.status == 'done':
+            return 1.0
+        total = max(self.total_stages or 0, len(self.stages))
+        if not total:
+            return 0.0
+        completed = sum(1 for status in self.stages.values() if status in ('done', 'failed'))
+        return completed / total
+
+    def snapshot(self):
+        """Plain-dict view of the job's current state"""
+        return {
+            'id': self.id,
+            'key': self.key,
+            'status': self.status,
+            'progress': self.progress,
+            'stages': dict(self.stages),
+            'error': self.error,
+            'elapsed': (self.finished_at or time.time()) - self.submitted_at
+        }
+
+class JobManager:
+    """
+    Runs jobs in background threads, deduplicating identical submissions
+
+    Parameters:
+    -----------
+    max_workers : int
+        Number of jobs that may run at the same time
+    keep_finished : int
+        Number of finished jobs kept around for their results to be fetched
+    """
+    def __init__(self, max_workers=2, keep_finished=64):
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, key, func, *args, total_stages=None, **kwargs):
+        """Start ``func(*args, on_progress=..., **kwargs)`` in the background
+
+        ``key`` identifies the work (e.g. symbol and parameters): while a job
+        with the same key is pending or running, that job is returned instead
+        of starting another one.
+        """
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                return job
+
+            job = Job(next(self._ids), key, total_stages)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        def on_progress(stage, status):
+            with self._lock:
+                job.stages[stage] = status
+
+        with self._lock:
+            job.status = 'running'
+        try:
+            result = func(*args, on_progress=on_progress, **kwargs)
+            with self._lock:
+                job.result = result
+                job.status = 'done'
+        except Exception as e:
+            print(f"Error in job {job.key}: {e}")
+            with self._lock:
+                job.error = str(e)
+                job.status = 'failed'
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond ``keep_finished``"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Get a job by id, or None if it is unknown or has been pruned"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        """Get a snapshot of a job's state, or None if it is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job is not None else None
+
+    def find(self, key):
+        """Get the pending or running job for a key, if any"""
+        with self._lock:
+            return self._active.get(key)
@@ -0,0 +1,248 @@
+
+import json
+from abc import ABC, abstractmethod
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from utils.synthetic import make_headline, make_ohlcv
+
+# Market data providers: daily prices, latest quote, company info and news.
+# The app, the price cache and the sentiment pipeline all go through
+# get_provider(), chosen by the MARKET_DATA_PROVIDER environment variable.
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+def normalize_ohlcv(frame):
+    """Flatten a price download into a Date-indexed OHLCV frame"""
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.copy()
+        frame.columns = frame.columns.get_level_values(0)
+    frame = frame[[col for col in COLUMNS if col in frame.columns]].dropna(how='all')
+    frame.index = pd.DatetimeIndex(frame.index).tz_localize(None).normalize()
+    frame.index.name = 'Date'
+    return frame
+
+class MarketDataProvider(ABC):
+    """
+    Interface for sources of market data
+
+    Subclasses implement every method; ``name`` keeps each provider's
+    cached prices apart.
+    """
+    name = None
+
+    @abstractmethod
+    def get_prices(self, symbol, start, end):
+        """Daily OHLCV bars from ``start`` up to (not including) ``end`` as a normalized frame"""
+
+    @abstractmethod
+    def get_quote(self, symbol):
+        """Latest bar as a dict with 'open' and 'price' (the close), or None"""
+
+    @abstractmethod
+    def get_info(self, symbol):
+        """Company information in yfinance's ``Ticker.info`` layout"""
+
+    @abstractmethod
+    def get_news(self, symbol):
+        """News articles as dicts with title, publisher, link and providerPublishTime"""
+
+class YahooProvider(MarketDataProvider):
+    """Live data from Yahoo Finance through yfinance"""
+    name = 'yahoo'
+
+    def get_prices(self, symbol, start, end):
+        data = yf.download(symbol, start=start, end=end, progress=False)
+        if data is None or data.empty:
+            return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+        return normalize_ohlcv(data)
+
+    def get_quote(self, symbol):
+        quote = yf.Ticker(symbol).history(period="1d")
+        if quote.empty:
+            return None
+        return {'open': quote['Open'].iloc[-1], 'price': quote['Close'].iloc[-1]}
+
+    def get_info(self, symbol):
+        return yf.Ticker(symbol).info
+
+    def get_news(self, symbol):
+        return yf.Ticker(symbol).news or []
+
+class LocalProvider(MarketDataProvider):
+    """
+    Offline data: recorded files replayed from a directory, or synthetic series
+
+    Parameters:
+    -----------
+    data_dir : str
+        Directory of recorded data. ``<SYMBOL>.csv`` or ``<SYMBOL>.parquet``
+        holds daily bars with a Date column; optional ``<SYMBOL>.info.json``
+        and ``<SYMBOL>.news.json`` hold company info and news. Symbols
+        without recorded bars get a synthetic random walk.
+    latency : float
+        Seconds added to every call, to imitate a remote service
+    rows_per_second : float
+        Simulated transfer rate for price requests (0 for unlimited)
+    seed : int
+        Seed for the synthetic series, combined with the symbol so each
+        symbol has its own stable history
+    """
+    name = 'local'
+    SYNTHETIC_START = '2000-01-03'
+
+    def __init__(self, data_dir=None, latency=0.0, rows_per_second=0.0, seed=0):
+        self.data_dir = data_dir
+        self.latency = latency
+        self.rows_per_second = rows_per_second
+        self.seed = seed
+        self._bars = {}
+        self._lock = threading.Lock()
+
+    def _delay(self, rows=0):
+        seconds = self.latency
+        if self.rows_per_second and rows:
+            seconds += rows / self.rows_per_second
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _path(self, filename):
+        if self.data_dir is None:
+            return None
+        path = os.path.join(self.data_dir, filename)
+        return path if os.path.exists(path) else None
+
+    def _seed(self, symbol, salt=0):
+        return [self.seed, zlib.crc32(symbol.encode()), salt]
+
+    def _rng(self, symbol, salt=0):
+        return np.random.default_rng(self._seed(symbol, salt))
+
+    def _read_recorded(self, symbol):
+        path = self._path(f"{symbol}.parquet")
+        if path:
+            frame = pd.read_parquet(path)
+        else:
+            path = self._path(f"{symbol}.csv")
+            if path is None:
+                return None
+            frame = pd.read_csv(path)
+        if 'Date' in frame.columns:
+            frame = frame.set_index('Date')
+        return normalize_ohlcv(frame).sort_index()
+
+    def _synthesize(self, symbol, through):
+        """Random-walk bars for every business day from SYNTHETIC_START through ``through``"""
+        days = len(pd.bdate_range(self.SYNTHETIC_START, through))
+        bars = make_ohlcv(days, seed=self._seed(symbol), start=self.SYNTHETIC_START)
+        return bars.astype({'Volume': np.float64})
+
+    def _history(self, symbol):
+        """All bars for a symbol, recorded if available, else synthetic through today"""
+        today = pd.Timestamp(datetime.now()).normalize()
+        with self._lock:
+            bars = self._bars.get(symbol)
+            # Synthetic series are regenerated (identically) once a new day starts
+            if bars is None or (bars.attrs.get('synthetic') and bars.attrs.get('through') < today):
+                bars = self._read_recorded(symbol)
+                if bars is None:
+                    bars = self._synthesize(symbol, today)
+                    bars.attrs.update(synthetic=True, through=today)
+                self._bars[symbol] = bars
+            return bars
+
+    def get_prices(self, symbol, start, end):
+        bars = self._history(symbol)
+        bars = bars[(bars.index >= pd.Timestamp(start)) & (bars.index < pd.Timestamp(end))]
+        self._delay(len(bars))
+        return bars.copy()
+
+    def get_quote(self, symbol):
+        bars = self._history(symbol)
+        self._delay(1)
+        if bars.empty:
+            return None
+        return {'open': bars['Open'].iloc[-1], 'price': bars['Close'].iloc[-1]}
+
+    def get_info(self, symbol):
+        self._delay()
+        path = self._path(f"{symbol}.info.json")
+        if path:
+            with open(path) as f:
+                return json.load(f)
+        bars = self._history(symbol)
+        rng = self._rng(symbol, 1)
+        info = {
+            'shortName': f"{symbol} Synthetic Inc.",
+            'sector': 'Synthetic',
+            'industry': 'Simulated Securities',
+            'longBusinessSummary': f"{symbol} is a synthetic company whose prices are a random walk.",
+            'trailingPE': round(float(rng.uniform(8, 40)), 2),
+            'marketCap': int(rng.uniform(5e8, 2e12)),
+        }
+        if len(bars) > 1:
+            info['previousClose'] = float(bars['Close'].iloc[-2])
+        return info
+
+    def get_news(self, symbol):
+        self._delay()
+        path = self._path(f"{symbol}.news.json")
+        if path:
+            with open(path) as f:
+                return json.load(f)
+        rng = self._rng(symbol, 2)
+        now = int(time.time())
+        return [
+            {
+                'title': make_headline(rng),
+                'publisher': 'Synthetic Wire',
+                'link': '',
+                'providerPublishTime': now - i * 3600
+            }
+            for i in range(8)
+        ]
+
+PROVIDERS = {
+    'yahoo': YahooProvider,
+    'local': LocalProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def provider_from_env():
+    """Build the provider named by MARKET_DATA_PROVIDER (default 'yahoo')
+
+    The local provider reads MARKET_DATA_DIR, MARKET_DATA_LATENCY,
+    MARKET_DATA_ROWS_PER_SECOND and MARKET_DATA_SEED.
+    """
+    name = os.environ.get('MARKET_DATA_PROVIDER', 'yahoo').lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown MARKET_DATA_PROVIDER {name!r}; expected one of {sorted(PROVIDERS)}")
+    if name == 'local':
+        return LocalProvider(
+            data_dir=os.environ.get('MARKET_DATA_DIR'),
+            latency=float(os.environ.get('MARKET_DATA_LATENCY', '0')),
+            rows_per_second=float(os.environ.get('MARKET_DATA_ROWS_PER_SECOND', '0')),
+            seed=int(os.environ.get('MARKET_DATA_SEED', '0'))
+        )
+    return PROVIDERS[name]()
+
+def get_provider():
+    """The process-wide market data provider"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = provider_from_env()
+        return _provider
+
+def set_provider(provider):
+    """Replace the process-wide provider (e.g. a LocalProvider in tests or load runs)"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,63 @@
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into short batches for a single handler call
+
+    Parameters:
+    -----------
+    handler : callable
+        Called with a list of items; must return a list of results in the
+        same order
+    max_batch_size : int
+        Largest number of items passed to one handler call
+    max_wait : float
+        Seconds to wait for more items after the first one arrives
+    """
+    def __init__(self, handler, max_batch_size=64, max_wait=0.01, name="micro-batcher"):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue an item, returning a Future for its result"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Queue an item and wait for its result"""
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        """Block for one item, then gather more until the batch is full or max_wait passes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.handler(items)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
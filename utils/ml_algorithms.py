@@ -1,69 +1,255 @@
 
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
+from sklearn.linear_model import LinearRegression, Ridge
 from sklearn.ensemble import RandomForestRegressor
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import make_pipeline
 from sklearn.svm import SVR
 from sklearn.model_selection import train_test_split
+from sklearn.multioutput import MultiOutputRegressor
 from sklearn.preprocessing import StandardScaler
 from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import hashlib
+import json
 import math
-import yfinance as yf
+import tempfile
+import threading
+from collections import OrderedDict
 import joblib
 import os
 from datetime import datetime, timedelta
+from utils.data_store import get_price_history
+from utils.instrumentation import increment, span, timed
+
+# Number of past trading days each training row looks back over
+LOOKBACK = 5
+
+def extract_features(close, volume):
+    """Build the lag / rolling-mean / rolling-std / volume feature matrix.
+
+    Row ``k`` describes the ``LOOKBACK`` days before day ``k + LOOKBACK``:
+    the closes from most to least recent, their mean, their sample standard
+    deviation and the previous day's volume. All rows are computed at once
+    from strided windows instead of one pandas slice per row.
+    """
+    close = np.asarray(close, dtype=np.float64).ravel()
+    volume = np.asarray(volume, dtype=np.float64).ravel()
+    n_rows = len(close) - LOOKBACK
+    if n_rows <= 0:
+        return np.empty((0, LOOKBACK + 3)), np.empty(0)
+
+    # windows[k] holds close[k:k + LOOKBACK], i.e. the days before target k + LOOKBACK
+    windows = np.lib.stride_tricks.sliding_window_view(close[:-1], LOOKBACK)
+
+    X = np.empty((n_rows, LOOKBACK + 3))
+    X[:, :LOOKBACK] = windows[:, ::-1]
+    X[:, LOOKBACK] = windows.mean(axis=1)
+    X[:, LOOKBACK + 1] = windows.std(axis=1, ddof=1)
+    X[:, LOOKBACK + 2] = volume[LOOKBACK - 1:-1]
+
+    # Target values (the closing price of each day being predicted)
+    y = close[LOOKBACK:].copy()
+
+    return X, y
 
 # MapReduce-like implementation for data processing
 def map_function(data_chunk):
     """Map function to process data chunks"""
-    # Extract features from data chunk
-    X = []
-    for i in range(5, len(data_chunk)):
-        features = []
-        # Use last 5 days as features
-        for j in range(5):
-            features.append(data_chunk['Close'].iloc[i-j-1])
-        # Add some technical indicators as features
-        # 5-day moving average
-        features.append(data_chunk['Close'].iloc[i-5:i].mean())
-        # 5-day standard deviation
-        features.append(data_chunk['Close'].iloc[i-5:i].std())
-        # Trading volume
-        features.append(data_chunk['Volume'].iloc[i-1])
-        X.append(features)
-    
-    # Extract target values (next day's closing price)
-    y = data_chunk['Close'].iloc[5:].values
-    
-    return X, y
+    return extract_features(data_chunk['Close'].values, data_chunk['Volume'].values)
 
 def reduce_function(mapped_results):
     """Reduce function to combine mapped results"""
-    all_X = []
-    all_y = []
+    all_X = [X for X, _ in mapped_results]
+    all_y = [y for _, y in mapped_results]
     
-    for X, y in mapped_results:
-        all_X.extend(X)
-        all_y.extend(y)
-    
-    return np.array(all_X), np.array(all_y)
+    return np.concatenate(all_X), np.concatenate(all_y)
+
+# Bumped whenever extract_features changes, so older saved models are retrained
+FEATURE_VERSION = 1
+
+# Saved model names used by each algorithm
+ALGORITHM_MODELS = {
+    'linear_regression': ['linear'],
+    'random_forest': ['rf'],
+    'svm': ['svm'],
+    'svm_approx': ['svm_approx'],
+    'ensemble': ['linear', 'rf', 'svm'],
+    'ensemble_approx': ['linear', 'rf', 'svm_approx'],
+}
+
+# Every saved model, in the order ensembles average them
+MODEL_NAMES = ('linear', 'rf', 'svm', 'svm_approx')
+
+# Bumped whenever the layout of saved model bundles changes
+BUNDLE_VERSION = 1
+
+# Optional compression for saved bundles, e.g. 'zlib' or 'lzma:6' (env
+# MODEL_COMPRESSION). Uncompressed bundles are memory-mapped when loaded;
+# compressed ones trade load time for disk space.
+MODEL_COMPRESSION = os.environ.get('MODEL_COMPRESSION') or None
+COMPRESSION_EXTENSIONS = {'zlib': '.z', 'gzip': '.gz', 'bz2': '.bz2', 'lzma': '.lzma', 'xz': '.xz'}
+
+# Hyperparameters used unless a model search has saved better ones for the
+# symbol (see utils.model_selection)
+DEFAULT_PARAMS = {
+    'rf': {'n_estimators': 100},
+    'svm': {'C': 100, 'gamma': 0.1, 'epsilon': 0.1},
+    'svm_approx': {'gamma': 0.1, 'n_components': 300, 'alpha': 0.01},
+}
+
+def make_model(name, params=None, n_samples=None):
+    """Build an unfitted model by its saved name
+
+    'svm_approx' approximates the RBF kernel with Nystroem features (a fixed
+    number of landmark rows) and fits a ridge regression on them, so its
+    training cost grows linearly with the number of rows where the exact
+    SVR's grows quadratically or worse. Passing ``n_samples`` caps the
+    landmarks at the number of training rows.
+    """
+    params = DEFAULT_PARAMS.get(name, {}) if params is None else params
+    if name == 'linear':
+        return LinearRegression()
+    if name == 'rf':
+        return RandomForestRegressor(**params, random_state=42)
+    if name == 'svm':
+        return SVR(kernel='rbf', **params)
+    if name == 'svm_approx':
+        return make_pipeline(
+            Nystroem(kernel='rbf', gamma=params['gamma'], random_state=42,
+                     n_components=min(params['n_components'], n_samples or params['n_components'])),
+            Ridge(alpha=params['alpha'])
+        )
+    raise ValueError(f"Unknown model {name}")
+
+def make_direct_model(name, params=None, n_samples=None):
+    """Build an unfitted multi-output model predicting every day of a horizon at once
+
+    Linear regression, the random forest and the ridge behind 'svm_approx'
+    fit several targets natively; the exact SVR gets one model per day.
+    """
+    model = make_model(name, params, n_samples)
+    return MultiOutputRegressor(model) if name == 'svm' else model
+
+# Forecast modes: 'recursive' feeds each one-day prediction back in as a
+# feature; 'direct' predicts days t+1..t+H together from the last known
+# window, with models trained on those H targets (fitted on first use)
+FORECAST_MODES = ('recursive', 'direct')
+DIRECT_HORIZON = 30
 
-def parallel_process_data(data, n_chunks=4):
-    """Process data using a MapReduce-like approach with parallel execution"""
-    # Split data into chunks
-    chunk_size = len(data) // n_chunks
-    chunks = [data.iloc[i:i+chunk_size] for i in range(0, len(data), chunk_size)]
+# Incremental updates: rows used for rolling refits, trees grown per update
+# (the oldest are dropped beyond RF_MAX_TREES), and how many updates are
+# allowed before a full retrain
+UPDATE_WINDOW = 500
+RF_GROWTH_TREES = 10
+RF_MAX_TREES = 150
+MAX_INCREMENTAL_UPDATES = 20
+
+def linear_statistics(X, y, reference, stats=None):
+    """Fold raw rows into the least-squares QR factor behind the linear model
+
+    Rows are standardized with the fixed ``reference`` (x_mean, x_scale,
+    y_mean, y_scale) and reduced to the R factor of ``[1, X, y]``, stacked
+    onto the one in ``stats`` if given. Solving from R keeps the
+    conditioning of X itself, where normal equations (XᵀX) would square it:
+    the lag and mean columns are collinear and volumes are ~1e8.
+    """
+    x_mean, x_scale, y_mean, y_scale = reference
+    rows = np.column_stack([np.ones(len(y)), (X - x_mean) / x_scale, (y - y_mean) / y_scale])
+    n = len(y)
+    if stats is not None:
+        rows = np.vstack([stats['r'], rows])
+        n += stats['n']
+    return {'n': n, 'reference': reference, 'r': np.linalg.qr(rows, mode='r')}
+
+def data_fingerprint(data):
+    """Identify a price history by its last date and a hash of its contents"""
+    close = np.ascontiguousarray(data['Close'].values, dtype=np.float64)
+    volume = np.ascontiguousarray(data['Volume'].values, dtype=np.float64)
+    dates = np.ascontiguousarray(pd.DatetimeIndex(data.index).values.astype('datetime64[ns]').astype('i8'))
+    digest = hashlib.sha1()
+    for array in (dates, close, volume):
+        digest.update(array.tobytes())
+    return {
+        'data_end': str(pd.Timestamp(data.index[-1]).date()),
+        'data_hash': digest.hexdigest(),
+        'rows': len(data)
+    }
+
+# Minimum number of training rows worth shipping to a worker process;
+# smaller inputs are cheaper to featurize in-process than to pickle
+MIN_CHUNK_ROWS = 250_000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Return the shared worker pool, starting it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor()
+            atexit.register(shutdown_executor)
+        return _executor
+
+def shutdown_executor():
+    """Stop the shared worker pool (it is restarted lazily when needed)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
+
+def choose_n_chunks(n_rows):
+    """Pick a chunk count from the number of training rows and available cores"""
+    return max(1, min(os.cpu_count() or 1, n_rows // MIN_CHUNK_ROWS))
+
+def _map_arrays(arrays):
+    """Map function for worker processes, which receive plain arrays"""
+    close, volume = arrays
+    return extract_features(close, volume)
+
+def parallel_process_data(data, n_chunks=None):
+    """Process data using a MapReduce-like approach with parallel execution
+
+    Each chunk carries a halo of the ``LOOKBACK`` rows preceding it, so the
+    result is identical to a single serial pass over ``data``. When
+    ``n_chunks`` is None it is chosen from the data size and core count.
+    """
+    close = np.asarray(data['Close'].values, dtype=np.float64).ravel()
+    volume = np.asarray(data['Volume'].values, dtype=np.float64).ravel()
+    n_rows = len(close) - LOOKBACK
+
+    if n_chunks is None:
+        n_chunks = choose_n_chunks(n_rows)
+    n_chunks = max(1, min(n_chunks, n_rows))
+    if n_chunks == 1:
+        return extract_features(close, volume)
+
+    # Split the training rows evenly; chunk k produces rows bounds[k]..bounds[k+1]
+    # and needs the LOOKBACK closes before its first row as a halo
+    bounds = np.linspace(0, n_rows, n_chunks + 1).astype(int)
+    chunks = [
+        (close[start:stop + LOOKBACK], volume[start:stop + LOOKBACK])
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
     
     # Execute map function in parallel
-    with ProcessPoolExecutor() as executor:
-        mapped_results = list(executor.map(map_function, chunks))
+    try:
+        mapped_results = list(get_executor().map(_map_arrays, chunks))
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool next time and finish serially
+        shutdown_executor()
+        mapped_results = [_map_arrays(chunk) for chunk in chunks]
     
     # Reduce the results
     return reduce_function(mapped_results)
 
 # Machine learning models
 class StockPredictor:
-    def __init__(self, symbol, algorithm='ensemble'):
+    def __init__(self, symbol, algorithm='ensemble', model_dir=None, compress=MODEL_COMPRESSION):
         """
         Initialize the stock predictor
         
@@ -72,37 +258,129 @@ class StockPredictor:
         symbol : str
             Stock ticker symbol
         algorithm : str
-            Algorithm to use ('linear_regression', 'random_forest', 'svm', or 'ensemble')
+            Algorithm to use (a key of ALGORITHM_MODELS: 'linear_regression',
+            'random_forest', 'svm', 'svm_approx', 'ensemble' or 'ensemble_approx')
+        model_dir : str
+            Directory for saved models (defaults to ``models/<symbol>``)
+        compress : str
+            Compression for the saved bundle ('zlib', 'gzip', 'bz2', 'lzma'
+            or 'xz', optionally with a level as in 'zlib:3'); None saves it
+            uncompressed so it can be memory-mapped
         """
         self.symbol = symbol
         self.algorithm = algorithm
+        self.compress = compress
         self.scaler_X = StandardScaler()
         self.scaler_y = StandardScaler()
         
-        # Initialize models
-        self.linear_model = LinearRegression()
-        self.rf_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.svm_model = SVR(kernel='rbf', C=100, gamma=0.1, epsilon=.1)
-        
         # Model file paths
-        self.model_dir = os.path.join('models', symbol)
+        self.model_dir = model_dir or os.path.join('models', symbol)
         os.makedirs(self.model_dir, exist_ok=True)
         
+        # Hyperparameters: the defaults, overridden by any saved search results
+        self.params = self._read_params()
+        
+        # Initialize models
+        self.linear_model = make_model('linear')
+        self.rf_model = make_model('rf', self.params['rf'])
+        self.svm_model = make_model('svm', self.params['svm'])
+        self.svm_approx_model = make_model('svm_approx', self.params['svm_approx'])
+        
+        # Description of the data the fitted models were trained on
+        self.metadata = None
+        # Least-squares sums behind the linear model, for incremental updates
+        self.linear_stats = None
+        # Multi-output models for direct forecasting, described by metadata['direct']
+        self.direct_models = {}
+        
+    def _model(self, name):
+        """The model attribute for a saved model name ('svm' -> ``svm_model``)"""
+        return getattr(self, f"{name}_model")
+    
+    def _get_bundle_path(self, compress=None):
+        """Path of this algorithm's model bundle, with the suffix for ``compress``"""
+        path = os.path.join(self.model_dir, f"{self.algorithm}.bundle.joblib")
+        if compress:
+            path += COMPRESSION_EXTENSIONS[compress.split(':')[0]]
+        return path
+    
+    def _find_bundle(self):
+        """Path of the saved bundle, compressed or not, or None"""
+        for compress in (None, *COMPRESSION_EXTENSIONS):
+            path = self._get_bundle_path(compress)
+            if os.path.exists(path):
+                return path, compress
+        return None, None
+    
     def _get_model_path(self, algo_name):
-        """Get path for saving/loading model"""
+        """Get path for saving/loading model (legacy per-file layout)"""
         return os.path.join(self.model_dir, f"{algo_name}_model.joblib")
     
     def _get_scaler_path(self, scaler_name):
         """Get path for saving/loading scaler"""
         return os.path.join(self.model_dir, f"{scaler_name}_scaler.joblib")
+    
+    def _get_stats_path(self):
+        """Get path for saving/loading the linear model's least-squares sums"""
+        return os.path.join(self.model_dir, "linear_stats.joblib")
+    
+    def _get_metadata_path(self):
+        """Get path for saving/loading training metadata"""
+        return os.path.join(self.model_dir, "metadata.json")
+    
+    def _get_params_path(self):
+        """Get path of the hyperparameters chosen by model selection"""
+        return os.path.join(self.model_dir, "best_params.json")
+    
+    def _read_params(self):
+        """Default hyperparameters updated with the saved best ones, if any"""
+        params = {name: dict(values) for name, values in DEFAULT_PARAMS.items()}
+        path = self._get_params_path()
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+                for name in params:
+                    params[name].update(saved.get(name, {}))
+            except (OSError, ValueError) as e:
+                print(f"Error reading best parameters: {e}")
+        return params
+    
+    def _params_match(self, metadata, names):
+        """Check whether saved models were fitted with the current hyperparameters"""
+        saved = metadata.get('params', DEFAULT_PARAMS)
+        return all(saved.get(name) == self.params[name] for name in names if name in self.params)
+    
+    def is_current(self, fingerprint):
+        """Check whether the fitted models were trained on the data with this fingerprint"""
+        if self.metadata is None:
+            return False
+        return (
+            self.metadata.get('feature_version') == FEATURE_VERSION
+            and self.metadata.get('data_hash') == fingerprint['data_hash']
+            and set(ALGORITHM_MODELS[self.algorithm]) <= set(self.metadata.get('models', []))
+        )
+    
+    def ensure_fitted(self, data):
+        """Make the models current for ``data``: reuse, load, update incrementally or retrain"""
+        fingerprint = data_fingerprint(data)
+        if self.is_current(fingerprint):
+            return True
+        if self.load_models():
+            if self.is_current(fingerprint):
+                return True
+            if self.can_update(data) and self.update(data):
+                return True
+        return self.train(data)
         
+    @timed('predictor.fetch_data')
     def fetch_data(self, years=2):
         """Fetch historical stock data"""
         end_date = datetime.now()
         start_date = end_date - timedelta(days=365 * years)
         
         try:
-            data = yf.download(self.symbol, start=start_date, end=end_date)
+            data = get_price_history(self.symbol, start_date, end_date)
             if data.empty:
                 raise ValueError(f"No data found for symbol {self.symbol}")
             return data
@@ -110,8 +388,9 @@ class StockPredictor:
             print(f"Error fetching data: {e}")
             return None
     
-    def train(self, data=None):
-        """Train the selected ML models"""
+    @timed('predictor.train')
+    def train(self, data=None, n_chunks=None, models=None):
+        """Train the selected ML models (or the named ``models``, e.g. MODEL_NAMES)"""
         if data is None:
             data = self.fetch_data()
             
@@ -120,62 +399,254 @@ class StockPredictor:
             
         try:
             # Process data using MapReduce approach
-            X, y = parallel_process_data(data)
+            with span('predictor.features'):
+                X, y = parallel_process_data(data, n_chunks)
+            increment('predictor.rows_processed', len(data))
             
             # Scale the features
             X_scaled = self.scaler_X.fit_transform(X)
             y_scaled = self.scaler_y.fit_transform(y.reshape(-1, 1)).flatten()
             
             # Split data
-            X_train, X_test, y_train, y_test = train_test_split(
-                X_scaled, y_scaled, test_size=0.2, random_state=42
+            X_train, X_test, y_train, y_test, X_train_raw, _, y_train_raw, _ = train_test_split(
+                X_scaled, y_scaled, X, y, test_size=0.2, random_state=42
             )
             
             # Train models based on selected algorithm
-            if self.algorithm in ['linear_regression', 'ensemble']:
-                self.linear_model.fit(X_train, y_train)
-                joblib.dump(self.linear_model, self._get_model_path('linear'))
-                
-            if self.algorithm in ['random_forest', 'ensemble']:
-                self.rf_model.fit(X_train, y_train)
-                joblib.dump(self.rf_model, self._get_model_path('rf'))
+            names = list(models or ALGORITHM_MODELS[self.algorithm])
+            if 'linear' in names:
+                with span('predictor.fit.linear'):
+                    self.linear_model.fit(X_train, y_train)
+                # Kept so that new rows can later be folded in exactly
+                self.linear_stats = linear_statistics(X_train_raw, y_train_raw, self._scaler_reference())
                 
-            if self.algorithm in ['svm', 'ensemble']:
-                self.svm_model.fit(X_train, y_train)
-                joblib.dump(self.svm_model, self._get_model_path('svm'))
-                
-            # Save scalers
-            joblib.dump(self.scaler_X, self._get_scaler_path('X'))
-            joblib.dump(self.scaler_y, self._get_scaler_path('y'))
+            for name in ('rf', 'svm', 'svm_approx'):
+                if name in names:
+                    model = self._model(name)
+                    if name == 'svm_approx':
+                        model = self.svm_approx_model = make_model(name, self.params[name], len(X_train))
+                    with span(f'predictor.fit.{name}'):
+                        model.fit(X_train, y_train)
+            
+            # Save the scalers and models with a record of what they were trained on
+            self._save(data_fingerprint(data), names)
             
             return True
         except Exception as e:
             print(f"Error training models: {e}")
             return False
     
-    def load_models(self):
-        """Load pre-trained models if they exist"""
+    def can_update(self, data):
+        """Check whether ``data`` only extends the loaded models' training data"""
+        if self.metadata is None or self.metadata.get('feature_version') != FEATURE_VERSION:
+            return False
+        if self.metadata.get('updates', 0) >= MAX_INCREMENTAL_UPDATES:
+            return False
+        if 'linear' in ALGORITHM_MODELS[self.algorithm] \
+                and (self.linear_stats is None or 'r' not in self.linear_stats):
+            # Models saved with the older normal-equation sums are retrained
+            return False
+        data_end = pd.Timestamp(self.metadata['data_end'])
+        return data_end in data.index and data.index[-1] > data_end
+    
+    @timed('predictor.update')
+    def update(self, data):
+        """Fold bars newer than the training data into the loaded models
+
+        The scalers stay as they were at the last full training, since the
+        retained trees' split thresholds and leaf values are in their units.
+        The linear model is re-solved exactly from its running QR factor. The
+        random forest grows a few trees on the most recent UPDATE_WINDOW rows
+        (retiring the oldest ones), and the SVR models, which cannot be updated
+        in place, are refitted on that same recent window.
+        """
+        if not self.can_update(data):
+            return False
+        
         try:
-            # Load scalers
-            if os.path.exists(self._get_scaler_path('X')):
-                self.scaler_X = joblib.load(self._get_scaler_path('X'))
-                
-            if os.path.exists(self._get_scaler_path('y')):
-                self.scaler_y = joblib.load(self._get_scaler_path('y'))
+            n_new = int((data.index > pd.Timestamp(self.metadata['data_end'])).sum())
+            X, y = map_function(data.iloc[-(n_new + UPDATE_WINDOW + LOOKBACK):])
+            X_new, y_new = X[-n_new:], y[-n_new:]
+            increment('predictor.rows_processed', n_new)
+            
+            X_window = self.scaler_X.transform(X[-UPDATE_WINDOW:])
+            y_window = self.scaler_y.transform(y[-UPDATE_WINDOW:].reshape(-1, 1)).flatten()
+            
+            names = ALGORITHM_MODELS[self.algorithm]
+            if 'linear' in names:
+                self.linear_stats = linear_statistics(X_new, y_new, self.linear_stats['reference'],
+                                                      self.linear_stats)
+                self._solve_linear()
+            
+            if 'rf' in names:
+                n_trees = len(self.rf_model.estimators_)
+                self.rf_model.set_params(warm_start=True, n_estimators=n_trees + RF_GROWTH_TREES)
+                self.rf_model.fit(X_window, y_window)
+                max_trees = max(RF_MAX_TREES, self.params['rf']['n_estimators'])
+                self.rf_model.estimators_ = self.rf_model.estimators_[-max_trees:]
+                self.rf_model.set_params(warm_start=False, n_estimators=len(self.rf_model.estimators_))
             
-            # Load models based on algorithm
-            if self.algorithm in ['linear_regression', 'ensemble']:
-                if os.path.exists(self._get_model_path('linear')):
-                    self.linear_model = joblib.load(self._get_model_path('linear'))
-                    
-            if self.algorithm in ['random_forest', 'ensemble']:
-                if os.path.exists(self._get_model_path('rf')):
-                    self.rf_model = joblib.load(self._get_model_path('rf'))
-                    
-            if self.algorithm in ['svm', 'ensemble']:
-                if os.path.exists(self._get_model_path('svm')):
-                    self.svm_model = joblib.load(self._get_model_path('svm'))
-                    
+            for name in ('svm', 'svm_approx'):
+                if name in names:
+                    if name == 'svm_approx':
+                        self.svm_approx_model = make_model(name, self.params[name], len(X_window))
+                    self._model(name).fit(X_window, y_window)
+            
+            self._save(data_fingerprint(data), names, updates=self.metadata.get('updates', 0) + 1)
+            return True
+        except Exception as e:
+            print(f"Error updating models: {e}")
+            return False
+    
+    def _scaler_reference(self):
+        """Current scaler means and scales, used to standardize the linear model's rows"""
+        return (self.scaler_X.mean_.copy(), self.scaler_X.scale_.copy(),
+                float(self.scaler_y.mean_[0]), float(self.scaler_y.scale_[0]))
+    
+    def _solve_linear(self):
+        """Set the linear model's coefficients from its least-squares QR factor"""
+        r = self.linear_stats['r']
+        ref_x_mean, ref_x_scale, ref_y_mean, ref_y_scale = self.linear_stats['reference']
+        solution = np.linalg.lstsq(r[:, :-1], r[:, -1], rcond=None)[0]
+        
+        # Back from the reference standardization to raw prices
+        coef = solution[1:] * ref_y_scale / ref_x_scale
+        intercept = ref_y_mean + ref_y_scale * solution[0] - coef @ ref_x_mean
+        
+        # Express the raw-space solution in the scalers' coordinates
+        x_mean, x_scale = self.scaler_X.mean_, self.scaler_X.scale_
+        y_mean, y_scale = self.scaler_y.mean_[0], self.scaler_y.scale_[0]
+        self.linear_model.coef_ = coef * x_scale / y_scale
+        self.linear_model.intercept_ = (coef @ x_mean + intercept - y_mean) / y_scale
+    
+    def _save(self, fingerprint, models, updates=0):
+        """Save the scalers and ``models`` as one bundle, with metadata describing their training data
+
+        Direct-forecast models depend on the scalers, so they are dropped
+        here and refitted when next needed.
+        """
+        self.direct_models = {}
+        self.metadata = {
+            'symbol': self.symbol,
+            'algorithm': self.algorithm,
+            'feature_version': FEATURE_VERSION,
+            **fingerprint,
+            'models': sorted(models),
+            'params': self.params,
+            'updates': updates,
+            'trained_at': datetime.now().isoformat(timespec='seconds')
+        }
+        self._write_bundle()
+    
+    def _write_bundle(self):
+        """Write the scalers, models and metadata to this algorithm's bundle
+
+        The bundle is written to a temporary file and renamed into place, so
+        readers (including processes that have the old one memory-mapped)
+        never see a partial file.
+        """
+        models = self.metadata['models']
+        bundle = {
+            'bundle_version': BUNDLE_VERSION,
+            'metadata': self.metadata,
+            'scaler_X': self.scaler_X,
+            'scaler_y': self.scaler_y,
+            'models': {name: self._model(name) for name in models},
+            'linear_stats': self.linear_stats if 'linear' in models else None,
+            'direct_models': self.direct_models
+        }
+        path = self._get_bundle_path(self.compress)
+        tmp_path = os.path.join(self.model_dir, f".{os.getpid()}.{threading.get_ident()}.tmp")
+        compress = 0
+        if self.compress:
+            method, _, level = self.compress.partition(':')
+            compress = (method, int(level or 3))
+        joblib.dump(bundle, tmp_path, compress=compress)
+        os.replace(tmp_path, path)
+        # Drop bundles saved earlier with a different compression setting
+        for other in (None, *COMPRESSION_EXTENSIONS):
+            other_path = self._get_bundle_path(other)
+            if other_path != path and os.path.exists(other_path):
+                os.remove(other_path)
+    
+    def _read_metadata(self):
+        """Read the training metadata written by the legacy per-file layout, if any"""
+        path = self._get_metadata_path()
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+    
+    def _usable(self, metadata, names):
+        """Check whether saved models described by ``metadata`` can serve this predictor"""
+        return (
+            metadata is not None
+            and metadata.get('feature_version') == FEATURE_VERSION
+            and set(names) <= set(metadata.get('models', []))
+            and self._params_match(metadata, names)
+        )
+    
+    def _load_bundle(self, names):
+        """Load this algorithm's bundle, returning False if it is missing or stale
+
+        Uncompressed bundles are memory-mapped read-only. Only plain NumPy
+        arrays stay mapped: SVR support vectors, Nystroem landmarks and
+        scaler statistics are shared between processes serving the same
+        symbol. Random-forest trees are not. scikit-learn copies each tree's
+        nodes into private memory when unpickling it, so a loaded forest
+        costs its full size in every process, whatever the bundle format.
+        """
+        path, compress = self._find_bundle()
+        if path is None:
+            return False
+        bundle = joblib.load(path, mmap_mode=None if compress else 'r')
+        if bundle.get('bundle_version') != BUNDLE_VERSION or not self._usable(bundle['metadata'], names):
+            return False
+        
+        self.scaler_X = bundle['scaler_X']
+        self.scaler_y = bundle['scaler_y']
+        for name in names:
+            setattr(self, f"{name}_model", bundle['models'][name])
+        self.linear_stats = bundle['linear_stats']
+        self.direct_models = bundle.get('direct_models', {})
+        self.metadata = bundle['metadata']
+        return True
+    
+    def _load_legacy(self, names):
+        """Load models saved one file each by earlier versions"""
+        metadata = self._read_metadata()
+        paths = [self._get_scaler_path('X'), self._get_scaler_path('y')]
+        paths += [self._get_model_path(name) for name in names]
+        if not self._usable(metadata, names) or not all(map(os.path.exists, paths)):
+            return False
+        
+        # Load scalers
+        self.scaler_X = joblib.load(self._get_scaler_path('X'))
+        self.scaler_y = joblib.load(self._get_scaler_path('y'))
+        
+        # Load models based on algorithm
+        for name in names:
+            setattr(self, f"{name}_model", joblib.load(self._get_model_path(name)))
+        if 'linear' in names and os.path.exists(self._get_stats_path()):
+            self.linear_stats = joblib.load(self._get_stats_path())
+        self.metadata = metadata
+        return True
+    
+    @timed('predictor.load_models')
+    def load_models(self):
+        """Load pre-trained models, returning False unless all required ones are saved
+
+        Models in the legacy per-file layout are loaded once and re-saved as
+        a bundle.
+        """
+        names = ALGORITHM_MODELS[self.algorithm]
+        try:
+            if self._load_bundle(names):
+                return True
+            if not self._load_legacy(names):
+                return False
+            fingerprint = {key: self.metadata[key] for key in ('data_end', 'data_hash', 'rows')}
+            self._save(fingerprint, names, updates=self.metadata.get('updates', 0))
             return True
         except Exception as e:
             print(f"Error loading models: {e}")
@@ -198,8 +669,131 @@ class StockPredictor:
         
         return np.array([features])
     
-    def predict_next_day(self, data=None, days=30):
-        """Predict stock prices for the next specified days"""
+    def _predict_scaled(self, features_scaled, names=None):
+        """Predict scaled prices for scaled feature rows with the selected algorithm (or ``names``)"""
+        names = names or ALGORITHM_MODELS[self.algorithm]
+        if len(names) == 1:
+            return self._model(names[0]).predict(features_scaled)
+        # Ensembles average the predictions of their models
+        return sum(self._model(name).predict(features_scaled) for name in names) / len(names)
+    
+    def _direct_current(self, names, horizon):
+        """Check whether direct models for ``names`` cover ``horizon`` days of the current data"""
+        direct = (self.metadata or {}).get('direct')
+        return (
+            direct is not None
+            and direct['data_hash'] == self.metadata['data_hash']
+            and direct['horizon'] >= horizon
+            and set(names) <= set(self.direct_models)
+        )
+    
+    @timed('predictor.fit_direct')
+    def fit_direct(self, data, horizon=DIRECT_HORIZON, models=None):
+        """Fit multi-output models predicting the next ``horizon`` closes from each feature row
+
+        Must follow ensure_fitted (or train) on the same data: the targets
+        are scaled with the fitted price scaler and rows are split as in
+        train. The models are added to the saved bundle and dropped whenever
+        the one-day models are retrained or updated.
+        """
+        names = list(models or ALGORITHM_MODELS[self.algorithm])
+        X, y = parallel_process_data(data)
+        n_rows = len(y) - horizon + 1
+        if n_rows < 10:
+            return False
+        
+        # Row k of Y holds the closes of days k + LOOKBACK .. k + LOOKBACK + horizon - 1
+        Y = np.lib.stride_tricks.sliding_window_view(y, horizon)
+        X_scaled = self.scaler_X.transform(X[:n_rows])
+        Y_scaled = (Y - self.scaler_y.mean_[0]) / self.scaler_y.scale_[0]
+        X_train, _, Y_train, _ = train_test_split(X_scaled, Y_scaled, test_size=0.2, random_state=42)
+        
+        for name in names:
+            model = make_direct_model(name, self.params.get(name), len(X_train))
+            with span(f'predictor.fit_direct.{name}'):
+                model.fit(X_train, Y_train)
+            self.direct_models[name] = model
+        
+        self.metadata['direct'] = {
+            'data_hash': self.metadata['data_hash'],
+            'horizon': horizon,
+            'models': sorted(self.direct_models)
+        }
+        self._write_bundle()
+        return True
+    
+    def ensure_direct(self, data, days=DIRECT_HORIZON):
+        """Make direct models covering ``days`` current for ``data`` (after ensure_fitted)"""
+        if self._direct_current(ALGORITHM_MODELS[self.algorithm], days):
+            return True
+        return self.fit_direct(data, max(days, DIRECT_HORIZON))
+    
+    def _last_features(self, closes, volumes):
+        """Scaled feature row describing the day after the last close"""
+        window = closes[-LOOKBACK:]
+        features = np.empty((1, LOOKBACK + 3))
+        features[0, :LOOKBACK] = window[::-1]
+        features[0, LOOKBACK] = window.mean()
+        features[0, LOOKBACK + 1] = window.std(ddof=1)
+        features[0, LOOKBACK + 2] = volumes[-1]
+        return (features - self.scaler_X.mean_) / self.scaler_X.scale_
+    
+    def _recursive_forecast(self, closes, volumes, days, names=None):
+        """Forecast ``days`` closes one day at a time, feeding each prediction back in"""
+        # Each forecast feeds the next one, so only the last LOOKBACK closes
+        # are needed: keep them in a fixed buffer (oldest first) and shift
+        # predictions into it instead of growing a copy of the history
+        window = closes[-LOOKBACK:].copy()
+        volume = volumes[-1]
+        # Forecast days are given the average historical volume
+        mean_volume = volumes.mean()
+        
+        x_mean, x_scale = self.scaler_X.mean_, self.scaler_X.scale_
+        y_mean, y_scale = self.scaler_y.mean_[0], self.scaler_y.scale_[0]
+        features = np.empty((1, LOOKBACK + 3))
+        features_scaled = np.empty((1, LOOKBACK + 3))
+        prices = np.empty(days)
+        
+        for day in range(days):
+            # Same features as map_function, built from the buffer
+            features[0, :LOOKBACK] = window[::-1]
+            features[0, LOOKBACK] = window.mean()
+            features[0, LOOKBACK + 1] = window.std(ddof=1)
+            features[0, LOOKBACK + 2] = volume
+            
+            # Scale features (as scaler_X.transform, without re-validating)
+            np.subtract(features, x_mean, out=features_scaled)
+            np.divide(features_scaled, x_scale, out=features_scaled)
+            
+            pred_scaled = self._predict_scaled(features_scaled, names)
+            
+            # Inverse transform to get actual price
+            prices[day] = pred_scaled[0] * y_scale + y_mean
+            
+            # Shift the prediction into the buffer for the next iteration
+            window[:-1] = window[1:]
+            window[-1] = prices[day]
+            volume = mean_volume
+        
+        return prices
+    
+    def _direct_forecast(self, closes, volumes, days, names=None):
+        """Forecast ``days`` closes with one multi-output predict per model"""
+        names = names or ALGORITHM_MODELS[self.algorithm]
+        features_scaled = self._last_features(closes, volumes)
+        pred_scaled = sum(self.direct_models[name].predict(features_scaled) for name in names) / len(names)
+        return pred_scaled[0, :days] * self.scaler_y.scale_[0] + self.scaler_y.mean_[0]
+    
+    @timed('predictor.predict')
+    def predict_next_day(self, data=None, days=30, mode='recursive'):
+        """Predict stock prices for the next specified days
+
+        ``mode`` is 'recursive' (one-day models applied day after day) or
+        'direct' (multi-output models predicting the whole horizon in one
+        call, trained on first use for at least DIRECT_HORIZON days).
+        """
+        if mode not in FORECAST_MODES:
+            raise ValueError(f"Unknown forecast mode {mode}")
         if data is None:
             data = self.fetch_data(years=1)  # Get at least 1 year of data
             
@@ -207,77 +801,107 @@ class StockPredictor:
             return None
             
         try:
-            # Try loading pre-trained models first
-            if not self.load_models():
-                # If models don't exist, train new ones
-                if not self.train(data):
+            # Use models trained on this data, loading or retraining as needed
+            if not self.ensure_fitted(data):
+                return None
+            
+            closes = np.asarray(data['Close'].values, dtype=np.float64).ravel()
+            volumes = np.asarray(data['Volume'].values, dtype=np.float64).ravel()
+            
+            if mode == 'direct':
+                if not self.ensure_direct(data, days):
                     return None
+                with span('predictor.forecast_direct'):
+                    prices = self._direct_forecast(closes, volumes, days)
+            else:
+                with span('predictor.forecast'):
+                    prices = self._recursive_forecast(closes, volumes, days)
             
-            # Make a copy of the latest data for predictions
-            latest_data = data.copy()
+            # Pair each forecast with its date
+            next_date = data.index[-1]
             predictions = []
-            
-            # Predict for the specified number of days
-            for _ in range(days):
-                # Prepare features for prediction
-                features = self.prepare_prediction_features(latest_data)
-                if features is None:
-                    break
-                    
-                # Scale features
-                features_scaled = self.scaler_X.transform(features)
-                
-                # Make predictions based on selected algorithm
-                if self.algorithm == 'linear_regression':
-                    pred_scaled = self.linear_model.predict(features_scaled)
-                elif self.algorithm == 'random_forest':
-                    pred_scaled = self.rf_model.predict(features_scaled)
-                elif self.algorithm == 'svm':
-                    pred_scaled = self.svm_model.predict(features_scaled)
-                else:  # ensemble
-                    # Average predictions from all models
-                    lr_pred = self.linear_model.predict(features_scaled)
-                    rf_pred = self.rf_model.predict(features_scaled)
-                    svm_pred = self.svm_model.predict(features_scaled)
-                    pred_scaled = (lr_pred + rf_pred + svm_pred) / 3
-                
-                # Inverse transform to get actual price
-                prediction = self.scaler_y.inverse_transform(pred_scaled.reshape(-1, 1))[0][0]
-                
-                # Add prediction to results
-                next_date = latest_data.index[-1] + timedelta(days=1)
+            for price in prices:
+                next_date = next_date + timedelta(days=1)
                 predictions.append({
                     'date': next_date,
-                    'price': prediction
+                    'price': price
                 })
-                
-                # Update data with prediction for next iteration
-                new_row = pd.DataFrame({
-                    'Open': prediction,
-                    'High': prediction * 1.01,  # Estimated
-                    'Low': prediction * 0.99,   # Estimated
-                    'Close': prediction,
-                    'Volume': latest_data['Volume'].mean()
-                }, index=[next_date])
-                
-                latest_data = pd.concat([latest_data, new_row])
-                
+            
             return predictions
         except Exception as e:
             print(f"Error making predictions: {e}")
             return None
 
-def get_ml_predictions(symbol, algorithm='ensemble', days=30):
-    """Get ML predictions for a given stock symbol"""
-    try:
+class ModelRegistry:
+    """In-process cache of fitted predictors keyed by symbol, algorithm and feature version
+
+    Predictors are checked against the fingerprint of the data they are
+    asked to serve: current ones are returned straight from memory, stale
+    or missing ones are loaded from disk or retrained. The least recently
+    used predictors are evicted beyond ``max_models``.
+    """
+    def __init__(self, max_models=32):
+        self.max_models = max_models
+        self._predictors = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_predictor(self, symbol, algorithm, data):
+        """Get a predictor fitted on ``data``, or None if training fails"""
+        key = (symbol, algorithm, FEATURE_VERSION)
+        fingerprint = data_fingerprint(data)
+        
+        with self._lock:
+            predictor = self._predictors.get(key)
+            if predictor is not None and predictor.is_current(fingerprint):
+                self._predictors.move_to_end(key)
+                increment('model_registry.hits')
+                return predictor
+        
+        increment('model_registry.misses')
         predictor = StockPredictor(symbol, algorithm)
-        predictions = predictor.predict_next_day(days=days)
+        if not predictor.ensure_fitted(data):
+            return None
+        
+        with self._lock:
+            self._predictors[key] = predictor
+            self._predictors.move_to_end(key)
+            while len(self._predictors) > self.max_models:
+                self._predictors.popitem(last=False)
+        return predictor
+    
+    def invalidate(self, symbol=None):
+        """Forget cached predictors for one symbol, or for all symbols"""
+        with self._lock:
+            for key in list(self._predictors):
+                if symbol is None or key[0] == symbol:
+                    del self._predictors[key]
+
+model_registry = ModelRegistry()
+
+def get_ml_predictions(symbol, algorithm='ensemble', days=30, data=None, mode='recursive', predictor=None):
+    """Get ML predictions for a given stock symbol (``mode`` is one of FORECAST_MODES)
+
+    ``predictor`` is a predictor already fitted on ``data`` to forecast with
+    instead of looking one up in the model registry.
+    """
+    try:
+        if data is None:
+            data = StockPredictor(symbol, algorithm).fetch_data(years=1)
+        if data is None:
+            return None
+        
+        if predictor is None:
+            predictor = model_registry.get_predictor(symbol, algorithm, data)
+        if predictor is None:
+            return None
+        predictions = predictor.predict_next_day(data, days=days, mode=mode)
         
         if predictions:
             # Format the results
             return {
                 'symbol': symbol,
                 'algorithm': algorithm,
+                'mode': mode,
                 'predictions': predictions,
                 'model_metrics': {
                     'accuracy': round(0.85 + np.random.random() * 0.1, 3),  # Simulated accuracy
@@ -289,82 +913,89 @@ def get_ml_predictions(symbol, algorithm='ensemble', days=30):
         print(f"Error getting ML predictions: {e}")
         return None
 
-def compare_algorithm_performance(symbol):
-    """Compare performance of different ML algorithms"""
-    algorithms = ['linear_regression', 'random_forest', 'svm', 'ensemble']
+def _score(predicted_prices, actual_prices, horizon):
+    """Error metrics of predicted against actual prices"""
+    # Mean Absolute Error (MAE)
+    mae = np.mean(np.abs(predicted_prices - actual_prices))
+    
+    # Root Mean Squared Error (RMSE)
+    rmse = np.sqrt(np.mean(np.square(predicted_prices - actual_prices)))
+    
+    # Mean Absolute Percentage Error (MAPE)
+    mape = np.mean(np.abs((actual_prices - predicted_prices) / actual_prices)) * 100
+    
+    return {
+        'horizon': horizon,
+        'mae': round(mae, 4),
+        'rmse': round(rmse, 4),
+        'mape': round(mape, 4),
+        'accuracy': round(100 - mape, 2)
+    }
+
+def walk_forward_backtest(symbol, data, test_days=30):
+    """Score every algorithm on the last test_days of data
+
+    The base models are trained once on the history before the test window
+    (in a scratch directory, leaving production models untouched). Each
+    algorithm is scored three ways:
+
+    - ``<algo>``: one-day-ahead predictions (horizon 1). The out-of-sample
+      features for every test day are built up front from the actual
+      prices, and each model predicts them in one batched call.
+    - ``<algo>_recursive``: a test_days forecast from the end of the
+      training data, feeding each prediction back in.
+    - ``<algo>_direct``: the same forecast from multi-output models trained
+      on test_days targets, in one predict per model.
+
+    The ensembles are averages of the base predictions, and the approximate
+    SVR is reported next to the exact one.
+    """
+    train_data = data.iloc[:-test_days]
+    X_all, y_all = map_function(data)
+    X_test = X_all[-test_days:]
+    actual_prices = y_all[-test_days:]
+    
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        predictor = StockPredictor(symbol, 'ensemble', model_dir=scratch_dir)
+        if not predictor.train(train_data, models=MODEL_NAMES):
+            return {}
+        has_direct = predictor.fit_direct(train_data, horizon=test_days, models=MODEL_NAMES)
+    
+    X_scaled = predictor.scaler_X.transform(X_test)
+    base_predictions = {name: predictor._model(name).predict(X_scaled) for name in MODEL_NAMES}
+    scaled_predictions = {
+        algo: sum(base_predictions[name] for name in names) / len(names)
+        for algo, names in ALGORITHM_MODELS.items()
+    }
+    
     results = {}
+    for algo, pred_scaled in scaled_predictions.items():
+        # Inverse transform to get actual prices
+        predicted_prices = predictor.scaler_y.inverse_transform(pred_scaled.reshape(-1, 1)).flatten()
+        results[algo] = _score(predicted_prices, actual_prices, 1)
     
-    for algo in algorithms:
-        try:
-            predictor = StockPredictor(symbol, algo)
-            data = predictor.fetch_data()
-            
-            if data is None or len(data) < 30:
-                continue
-                
-            # Split data for validation
-            train_data = data.iloc[:-30]
-            test_data = data.iloc[-30:]
-            
-            # Train model
-            if not predictor.train(train_data):
-                continue
-                
-            # Make predictions for the test period
-            predictions = []
-            test_copy = train_data.copy()
-            
-            for i in range(len(test_data)):
-                features = predictor.prepare_prediction_features(test_copy)
-                if features is None:
-                    break
-                    
-                # Scale features
-                features_scaled = predictor.scaler_X.transform(features)
-                
-                # Make prediction based on algorithm
-                if algo == 'linear_regression':
-                    pred_scaled = predictor.linear_model.predict(features_scaled)
-                elif algo == 'random_forest':
-                    pred_scaled = predictor.rf_model.predict(features_scaled)
-                elif algo == 'svm':
-                    pred_scaled = predictor.svm_model.predict(features_scaled)
-                else:  # ensemble
-                    # Average predictions from all models
-                    lr_pred = predictor.linear_model.predict(features_scaled)
-                    rf_pred = predictor.rf_model.predict(features_scaled)
-                    svm_pred = predictor.svm_model.predict(features_scaled)
-                    pred_scaled = (lr_pred + rf_pred + svm_pred) / 3
-                
-                # Inverse transform to get actual price
-                prediction = predictor.scaler_y.inverse_transform(pred_scaled.reshape(-1, 1))[0][0]
-                predictions.append(prediction)
-                
-                # Add actual data point to test_copy for next prediction
-                test_copy = pd.concat([test_copy, test_data.iloc[[i]]])
-            
-            # Calculate error metrics
-            actual_prices = test_data['Close'].values
-            predicted_prices = np.array(predictions)
-            
-            # Mean Absolute Error (MAE)
-            mae = np.mean(np.abs(predicted_prices - actual_prices))
-            
-            # Root Mean Squared Error (RMSE)
-            rmse = np.sqrt(np.mean(np.square(predicted_prices - actual_prices)))
-            
-            # Mean Absolute Percentage Error (MAPE)
-            mape = np.mean(np.abs((actual_prices - predicted_prices) / actual_prices)) * 100
-            
-            results[algo] = {
-                'mae': round(mae, 4),
-                'rmse': round(rmse, 4),
-                'mape': round(mape, 4),
-                'accuracy': round(100 - mape, 2)
-            }
-            
-        except Exception as e:
-            print(f"Error comparing {algo}: {e}")
-            continue
+    # Multi-day forecasts over the whole window, in both modes
+    closes = np.asarray(train_data['Close'].values, dtype=np.float64).ravel()
+    volumes = np.asarray(train_data['Volume'].values, dtype=np.float64).ravel()
+    for algo, names in ALGORITHM_MODELS.items():
+        recursive = predictor._recursive_forecast(closes, volumes, test_days, names)
+        results[f"{algo}_recursive"] = _score(recursive, actual_prices, test_days)
+        if has_direct:
+            direct = predictor._direct_forecast(closes, volumes, test_days, names)
+            results[f"{algo}_direct"] = _score(direct, actual_prices, test_days)
     
     return results
+
+def compare_algorithm_performance(symbol, data=None):
+    """Compare performance of different ML algorithms"""
+    try:
+        if data is None:
+            data = StockPredictor(symbol).fetch_data()
+        
+        if data is None or len(data) < 30:
+            return {}
+        
+        return walk_forward_backtest(symbol, data, test_days=30)
+    except Exception as e:
+        print(f"Error comparing algorithms: {e}")
+        return {}
@@ -0,0 +1,256 @@
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import datetime
+import joblib
+import numpy as np
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.preprocessing import StandardScaler
+from utils.instrumentation import increment, timed
+from utils.ml_algorithms import (
+    DEFAULT_PARAMS, StockPredictor, data_fingerprint, get_executor, make_model, model_registry,
+    parallel_process_data
+)
+
+# Hyperparameter candidates per model. The current defaults are always
+# evaluated first, so a tight budget still yields a usable comparison.
+PARAM_GRID = {
+    'rf': [
+        {'n_estimators': n_estimators, 'max_depth': max_depth, 'min_samples_leaf': min_samples_leaf}
+        for n_estimators in (100, 200)
+        for max_depth in (None, 8, 16)
+        for min_samples_leaf in (1, 5)
+    ],
+    'svm': [
+        {'C': C, 'gamma': gamma, 'epsilon': epsilon}
+        for C in (1, 10, 100, 1000)
+        for gamma in (0.01, 0.1, 1.0)
+        for epsilon in (0.01, 0.1)
+    ],
+    'svm_approx': [
+        {'gamma': gamma, 'n_components': n_components, 'alpha': alpha}
+        for gamma in (0.01, 0.1, 1.0)
+        for n_components in (300, 1000)
+        for alpha in (0.001, 0.01, 0.1)
+    ],
+}
+
+def _evaluate_fold(X_path, y_path, name, params, train_end, test_end):
+    """Fit one candidate on rows [0, train_end) and score it on [train_end, test_end)
+
+    The feature matrix is memory-mapped from disk, so tasks only carry the
+    file paths. Scalers are fitted on the training rows alone, so nothing
+    from the validation period leaks into the fit.
+    """
+    X = joblib.load(X_path, mmap_mode='r')
+    y = joblib.load(y_path, mmap_mode='r')
+    scaler_X = StandardScaler().fit(X[:train_end])
+    scaler_y = StandardScaler().fit(y[:train_end].reshape(-1, 1))
+
+    model = make_model(name, params, n_samples=train_end)
+    model.fit(scaler_X.transform(X[:train_end]), scaler_y.transform(y[:train_end].reshape(-1, 1)).ravel())
+    predicted = model.predict(scaler_X.transform(X[train_end:test_end]))
+    predicted = predicted * scaler_y.scale_[0] + scaler_y.mean_[0]
+    errors = predicted - y[train_end:test_end]
+    return float(np.sqrt(np.mean(np.square(errors)))), float(np.mean(np.abs(errors)))
+
+def _with_defaults(name, params, keys):
+    """``params`` with each of ``keys`` it leaves out set to the model's default value"""
+    missing = set(keys) - set(params)
+    if not missing:
+        return dict(params)
+    defaults = make_model(name, params).get_params()
+    return {**params, **{key: defaults[key] for key in sorted(missing)}}
+
+def _candidates(models, grid):
+    """(model, params) pairs, defaults first and alternating between models
+
+    Every candidate spells out each parameter tuned for its model, so the
+    defaults are not evaluated a second time as an equivalent grid point.
+    """
+    per_model = []
+    for name in models:
+        keys = set(DEFAULT_PARAMS[name]).union(*grid[name])
+        params = []
+        for candidate in [DEFAULT_PARAMS[name], *grid[name]]:
+            candidate = _with_defaults(name, candidate, keys)
+            if candidate not in params:
+                params.append(candidate)
+        per_model.append([(name, p) for p in params])
+    ordered = []
+    for i in range(max(map(len, per_model), default=0)):
+        ordered.extend(candidates[i] for candidates in per_model if i < len(candidates))
+    return ordered
+
+def _remove_when_done(futures, path):
+    """Delete the directory ``path`` once every one of ``futures`` has finished"""
+    if not futures:
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def finished(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            shutil.rmtree(path, ignore_errors=True)
+
+    for future in futures:
+        future.add_done_callback(finished)
+
+@timed('model_selection.search')
+def search_hyperparameters(symbol, data=None, models=('rf', 'svm', 'svm_approx'), n_splits=5, time_budget=300.0,
+                           grid=None, save=True):
+    """
+    Choose hyperparameters for a symbol by walk-forward cross-validation
+
+    Parameters:
+    -----------
+    symbol : str
+        Stock ticker symbol
+    data : DataFrame
+        Price history (defaults to two years fetched for the symbol)
+    models : tuple of str
+        Models to tune (keys of PARAM_GRID: 'rf', 'svm', 'svm_approx')
+    n_splits : int
+        Number of expanding-window folds; each is trained on everything
+        before its validation period
+    time_budget : float
+        Wall-clock seconds allowed. Every (candidate, fold) pair runs as a
+        separate task in the shared worker pool; tasks not finished by the
+        deadline are cancelled and their candidates are left unscored.
+        The search returns at the deadline without waiting for tasks
+        already running.
+    grid : dict
+        Candidates per model (defaults to PARAM_GRID)
+    save : bool
+        Write the winners to ``models/<symbol>/best_params.json``, which
+        StockPredictor reads when it is created
+
+    Returns a dict with the best parameters per model, every scored
+    candidate's mean RMSE and MAE, and whether the search finished.
+    """
+    grid = grid or PARAM_GRID
+    start = time.perf_counter()
+    predictor = StockPredictor(symbol)
+    if data is None:
+        data = predictor.fetch_data()
+    if data is None:
+        return None
+
+    X, y = parallel_process_data(data)
+    folds = [(int(train[-1]) + 1, int(test[-1]) + 1) for train, test in TimeSeriesSplit(n_splits).split(X)]
+    candidates = _candidates(models, grid)
+
+    # Workers memory-map the features instead of receiving a pickled copy per task
+    scratch_dir = tempfile.mkdtemp(prefix="model-selection-")
+    tasks = {}
+    try:
+        X_path = os.path.join(scratch_dir, "X.joblib")
+        y_path = os.path.join(scratch_dir, "y.joblib")
+        joblib.dump(np.ascontiguousarray(X), X_path)
+        joblib.dump(np.ascontiguousarray(y), y_path)
+
+        executor = get_executor()
+        for index, (name, params) in enumerate(candidates):
+            for train_end, test_end in folds:
+                future = executor.submit(_evaluate_fold, X_path, y_path, name, params, train_end, test_end)
+                tasks[future] = index
+
+        fold_scores = {}
+        pending = set(tasks)
+        deadline = start + time_budget
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    fold_scores.setdefault(tasks[future], []).append(future.result())
+                except Exception as e:
+                    name, params = candidates[tasks[future]]
+                    print(f"Error evaluating {name} {params}: {e}")
+        increment('model_selection.fits', sum(map(len, fold_scores.values())))
+    finally:
+        # Tasks already running when the budget ran out cannot be cancelled;
+        # their memory-mapped inputs are deleted once the last one finishes
+        running = [future for future in tasks if not future.cancel() and not future.done()]
+        _remove_when_done(running, scratch_dir)
+
+    scores = {name: [] for name in models}
+    for index, results in fold_scores.items():
+        if len(results) < len(folds):
+            continue
+        name, params = candidates[index]
+        rmse, mae = np.mean(results, axis=0)
+        scores[name].append({'params': params, 'rmse': round(float(rmse), 6), 'mae': round(float(mae), 6)})
+
+    best = {}
+    for name in models:
+        scores[name].sort(key=lambda score: score['rmse'])
+        if scores[name]:
+            best[name] = scores[name][0]['params']
+
+    result = {
+        'symbol': symbol,
+        'best': best,
+        'scores': scores,
+        'folds': len(folds),
+        'evaluated': sum(len(s) for s in scores.values()),
+        'candidates': len(candidates),
+        'complete': not pending,
+        'seconds': round(time.perf_counter() - start, 2)
+    }
+
+    if save and best:
+        # Keep earlier winners for models not searched this time
+        saved = {}
+        if os.path.exists(predictor._get_params_path()):
+            with open(predictor._get_params_path()) as f:
+                saved = json.load(f)
+        saved.update({
+            **best,
+            'cv_rmse': {**saved.get('cv_rmse', {}), **{name: scores[name][0]['rmse'] for name in best}},
+            'folds': len(folds),
+            'data_end': data_fingerprint(data)['data_end'],
+            'searched_at': datetime.now().isoformat(timespec='seconds')
+        })
+        with open(predictor._get_params_path(), 'w') as f:
+            json.dump(saved, f, indent=2)
+        # Models fitted with the old parameters are retrained on next use
+        model_registry.invalidate(symbol)
+
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune model hyperparameters by walk-forward cross-validation")
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--models', nargs='+', default=sorted(PARAM_GRID), choices=sorted(PARAM_GRID))
+    parser.add_argument('--splits', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=300.0, help="seconds per symbol")
+    parser.add_argument('--dry-run', action='store_true', help="report without saving the winners")
+    args = parser.parse_args()
+
+    for symbol in args.symbols:
+        result = search_hyperparameters(symbol.upper(), models=tuple(args.models), n_splits=args.splits,
+                                        time_budget=args.budget, save=not args.dry_run)
+        if result is None:
+            print(f"{symbol.upper()}: no data")
+            continue
+        status = "complete" if result['complete'] else "budget exhausted"
+        print(f"{symbol.upper()}: {result['evaluated']}/{result['candidates']} candidates scored "
+              f"over {result['folds']} folds in {result['seconds']}s ({status})")
+        for name, params in result['best'].items():
+            print(f"  {name}: {params} (rmse {result['scores'][name][0]['rmse']})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+
+import threading
+
+# NLP models are loaded on first use rather than at import time, so importing
+# the sentiment module (and starting the app) does not pay for torch,
+# transformers or the NLTK lexicon until sentiment is actually needed.
+# Each model is loaded once per process and shared by all threads.
+
+SENTIMENT_MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
+
+_vader_lock = threading.Lock()
+_vader = None
+
+_pipeline_lock = threading.Lock()
+_sentiment_pipeline = None
+_pipeline_loaded = False
+
+def get_vader():
+    """Get the shared NLTK VADER sentiment analyzer, loading it on first use."""
+    global _vader
+    if _vader is None:
+        with _vader_lock:
+            if _vader is None:
+                import nltk
+                from nltk.sentiment import SentimentIntensityAnalyzer
+
+                # Download necessary NLTK data (first time only)
+                try:
+                    nltk.data.find('sentiment/vader_lexicon.zip')
+                except LookupError:
+                    nltk.download('vader_lexicon', quiet=True)
+
+                _vader = SentimentIntensityAnalyzer()
+    return _vader
+
+def get_sentiment_pipeline():
+    """Get the shared transformer sentiment pipeline, or None if it can't be loaded."""
+    global _sentiment_pipeline, _pipeline_loaded
+    if not _pipeline_loaded:
+        with _pipeline_lock:
+            if not _pipeline_loaded:
+                try:
+                    from transformers import pipeline
+                    _sentiment_pipeline = pipeline("sentiment-analysis", model=SENTIMENT_MODEL_NAME)
+                except Exception as e:
+                    # Fallback to VADER if the model can't be loaded
+                    print(f"Error loading transformer model: {e}")
+                    _sentiment_pipeline = None
+                _pipeline_loaded = True
+    return _sentiment_pipeline
+
+def warm_up(background=False):
+    """Load the NLP models ahead of the first request, optionally in a background thread."""
+    if background:
+        thread = threading.Thread(target=warm_up, name="nlp-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    get_vader()
+    get_sentiment_pipeline()
+    return None
@@ -0,0 +1,103 @@
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from utils.instrumentation import recorder
+from utils.ml_algorithms import get_executor
+
+class Stage:
+    """
+    One step of a pipeline
+
+    Parameters:
+    -----------
+    name : str
+        Name the stage's result is stored under
+    func : callable
+        Called with ``*args`` plus one keyword argument per dependency,
+        holding that dependency's result. CPU-bound stages run in the
+        shared worker pool, so their function must be picklable.
+    deps : tuple of str
+        Names of the stages whose results this stage needs
+    cpu_bound : bool
+        Run in the process pool instead of an I/O thread
+    """
+    def __init__(self, name, func, deps=(), args=(), cpu_bound=False):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.args = tuple(args)
+        self.cpu_bound = cpu_bound
+
+def _run_recorded(func, args, kwargs):
+    """Run a CPU-bound stage in a worker, returning its result and the spans it recorded"""
+    # Anything left by earlier tasks in this worker was never collected
+    recorder.drain()
+    result = func(*args, **kwargs)
+    return result, recorder.drain()
+
+def run_stages(stages, io_workers=8, on_progress=None):
+    """Run a dependency graph of stages, each as soon as its inputs are ready
+
+    I/O-bound stages run in a thread pool and CPU-bound ones in the shared
+    process pool, so independent stages overlap and the total latency is
+    that of the slowest chain rather than the sum of every stage. A stage
+    that fails logs its error and yields None to its dependents.
+    ``on_progress`` is called with ``(stage_name, status)`` as stages start
+    ('running') and finish ('done' or 'failed'), and the time from each
+    stage's submission to its completion is recorded as a ``stage.<name>``
+    span (this includes any wait for a free worker). Spans and counters
+    recorded inside worker processes are merged into this process's
+    recorder.
+
+    Returns a dict mapping stage names to results.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+
+    def notify(name, status):
+        if on_progress is not None:
+            on_progress(name, status)
+
+    results = {}
+    pending = dict(by_name)
+    running = {}
+    started = {}
+
+    with ThreadPoolExecutor(max_workers=io_workers) as io_executor:
+        while pending or running:
+            # Start every stage whose dependencies have all finished
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage.deps):
+                    kwargs = {dep: results[dep] for dep in stage.deps}
+                    if stage.cpu_bound:
+                        future = get_executor().submit(_run_recorded, stage.func, stage.args, kwargs)
+                    else:
+                        future = io_executor.submit(stage.func, *stage.args, **kwargs)
+                    running[future] = name
+                    del pending[name]
+                    started[name] = time.perf_counter()
+                    notify(name, 'running')
+
+            if not running:
+                raise ValueError(f"Stages have circular dependencies: {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                recorder.record(f"stage.{name}", time.perf_counter() - started[name])
+                try:
+                    if by_name[name].cpu_bound:
+                        results[name], recorded = future.result()
+                        recorder.merge(recorded)
+                    else:
+                        results[name] = future.result()
+                    notify(name, 'done')
+                except Exception as e:
+                    print(f"Error in stage {name}: {e}")
+                    results[name] = None
+                    notify(name, 'failed')
+
+    return results
@@ -1,61 +1,99 @@
 
-import nltk
-import torch
-from nltk.sentiment import SentimentIntensityAnalyzer
-from transformers import pipeline, AutoModelForSequenceClassification, AutoTokenizer
-import requests
-from bs4 import BeautifulSoup
-import os
-import yfinance as yf
-import re
-from utils.ml_algorithms import get_ml_predictions, compare_algorithm_performance
-
-# Download necessary NLTK data (first time only)
-try:
-    nltk.data.find('vader_lexicon')
-except LookupError:
-    nltk.download('vader_lexicon')
-
-# Initialize the sentiment analyzer
-sia = SentimentIntensityAnalyzer()
-
-# Initialize a lightweight sentiment model
-sentiment_model_name = "distilbert-base-uncased-finetuned-sst-2-english"
-try:
-    sentiment_pipeline = pipeline("sentiment-analysis", model=sentiment_model_name)
-except:
-    # Fallback to VADER if the model can't be loaded
-    sentiment_pipeline = None
+from datetime import timedelta
+from utils.ml_algorithms import StockPredictor, get_ml_predictions, compare_algorithm_performance
+from utils.nlp_models import SENTIMENT_MODEL_NAME, get_vader, get_sentiment_pipeline
+from utils.instrumentation import increment, span, timed
+from utils.market_data import get_provider
+from utils.pipeline import Stage, run_stages
+from utils.sentiment_cache import sentiment_cache, text_key
 
-def analyze_sentiment(text):
-    """Analyze sentiment using NLTK's VADER and/or the transformer model."""
+# Texts per transformer forward pass, and the token limit each text is truncated to
+SENTIMENT_BATCH_SIZE = 32
+SENTIMENT_MAX_TOKENS = 512
+
+# Bumped whenever scoring changes in a way that invalidates cached scores
+SENTIMENT_CACHE_VERSION = 1
+
+def _score_texts(texts, batch_size, max_length):
+    """Score texts with VADER and the transformer, reporting whether the transformer ran."""
     # Get VADER sentiment
-    vader_scores = sia.polarity_scores(text)
-    
-    # Get transformer model sentiment if available
-    transformer_scores = None
-    if sentiment_pipeline:
-        try:
-            # Limit text length for transformer model
-            limited_text = text[:512]
-            transformer_result = sentiment_pipeline(limited_text)[0]
-            transformer_scores = {
+    sia = get_vader()
+    with span('sentiment.vader'):
+        results = [{"vader": sia.polarity_scores(text), "transformer": None} for text in texts]
+    increment('sentiment.texts_scored', len(texts))
+    
+    # Get transformer model sentiment if available, padding each batch of
+    # texts together and truncating them by tokens rather than characters
+    sentiment_pipeline = get_sentiment_pipeline() if texts else None
+    if not sentiment_pipeline:
+        # VADER-only scores are returned but not cached under the transformer's version
+        return results, False
+    try:
+        with span('sentiment.transformer'):
+            transformer_results = sentiment_pipeline(
+                texts, batch_size=batch_size, truncation=True, max_length=max_length
+            )
+        for result, transformer_result in zip(results, transformer_results):
+            result["transformer"] = {
                 "label": transformer_result["label"],
                 "score": transformer_result["score"]
             }
-        except Exception as e:
-            print(f"Error using transformer model: {e}")
+    except Exception as e:
+        print(f"Error using transformer model: {e}")
+        return results, False
     
-    return {
-        "vader": vader_scores,
-        "transformer": transformer_scores
-    }
+    return results, True
+
+def sentiment_model_version(max_length=SENTIMENT_MAX_TOKENS):
+    """Version of the cached scores: the scoring models and how texts are truncated"""
+    return f"v{SENTIMENT_CACHE_VERSION}:vader+{SENTIMENT_MODEL_NAME}:{max_length}"
+
+def analyze_sentiment_batch(texts, batch_size=SENTIMENT_BATCH_SIZE, max_length=SENTIMENT_MAX_TOKENS,
+                            use_cache=True):
+    """Analyze the sentiment of many texts with VADER and batched transformer passes."""
+    texts = list(texts)
+    if not use_cache or not texts:
+        return _score_texts(texts, batch_size, max_length)[0]
+    
+    # Keyed by the model name rather than the loaded pipeline, so cache hits
+    # never load torch; only complete scores are written back
+    keys = [text_key(text, sentiment_model_version(max_length)) for text in texts]
+    
+    try:
+        cached = sentiment_cache.get_many(keys)
+    except Exception as e:
+        print(f"Error reading sentiment cache: {e}")
+        cached = {}
+    
+    # Only score each distinct uncached text once
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+    increment('sentiment_cache.hits', len(keys) - len(missing))
+    increment('sentiment_cache.misses', len(missing))
+    
+    if missing:
+        scored, complete = _score_texts(list(missing.values()), batch_size, max_length)
+        new_scores = dict(zip(missing.keys(), scored))
+        cached.update(new_scores)
+        if complete:
+            try:
+                sentiment_cache.put_many(new_scores)
+            except Exception as e:
+                print(f"Error writing sentiment cache: {e}")
+    
+    return [cached[key] for key in keys]
 
-def get_news_sentiment(symbol, num_articles=5):
+def analyze_sentiment(text):
+    """Analyze sentiment using NLTK's VADER and/or the transformer model."""
+    return analyze_sentiment_batch([text])[0]
+
+def get_news_sentiment(symbol, num_articles=5, provider=None):
     """Get news articles and analyze their sentiment for a given stock."""
-    # Fetch news using yfinance
-    stock = yf.Ticker(symbol)
-    news_data = stock.news
+    # Fetch news from the market data provider
+    provider = provider or get_provider()
+    news_data = provider.get_news(symbol)
     
     if not news_data:
         return {"error": "No news found"}
@@ -63,16 +101,15 @@ def get_news_sentiment(symbol, num_articles=5):
     # Limit to the requested number of articles
     news_data = news_data[:num_articles]
     
-    analyzed_news = []
-    combined_text = ""
+    titles = [article.get('title', '') for article in news_data]
+    combined_text = " ".join(titles) + " "
     
-    for article in news_data:
-        title = article.get('title', '')
-        combined_text += title + " "
-        
-        # Analyze each article
-        sentiment = analyze_sentiment(title)
-        
+    # Analyze each article and all headlines together in one batch
+    sentiments = analyze_sentiment_batch(titles + [combined_text])
+    overall_sentiment = sentiments.pop()
+    
+    analyzed_news = []
+    for article, title, sentiment in zip(news_data, titles, sentiments):
         analyzed_news.append({
             "title": title,
             "publisher": article.get('publisher', ''),
@@ -81,19 +118,16 @@ def get_news_sentiment(symbol, num_articles=5):
             "sentiment": sentiment
         })
     
-    # Analyze all headlines together
-    overall_sentiment = analyze_sentiment(combined_text)
-    
     return {
         "analyzed_news": analyzed_news,
         "overall_sentiment": overall_sentiment
     }
 
-def generate_stock_insights(symbol, price_data=None, ml_predictions=None):
+def generate_stock_insights(symbol, price_data=None, ml_predictions=None, info=None):
     """Generate insights about a stock using available data."""
     # Get stock information
-    stock = yf.Ticker(symbol)
-    info = stock.info
+    if info is None:
+        info = get_provider().get_info(symbol)
     
     # Basic stock information
     company_name = info.get('shortName', symbol)
@@ -157,29 +191,70 @@ def generate_stock_insights(symbol, price_data=None, ml_predictions=None):
     
     return summary
 
-def get_stock_sentiment_summary(symbol):
-    """Get a combined sentiment and summary for a stock."""
-    # Get news sentiment
-    news_sentiment = get_news_sentiment(symbol)
-    
-    # Get stock info
-    stock = yf.Ticker(symbol)
-    quote = stock.history(period="1d")
-    
-    if not quote.empty:
-        price_data = {
-            'price': quote['Close'].iloc[-1],
-            'change': quote['Close'].iloc[-1] - quote['Open'].iloc[-1],
-            'changePercent': ((quote['Close'].iloc[-1] - quote['Open'].iloc[-1]) / quote['Open'].iloc[-1]) * 100
-        }
-    else:
-        price_data = None
+# Stages of get_stock_sentiment_summary, as reported to its progress callback
+SUMMARY_STAGES = ('news_sentiment', 'info', 'price_data', 'history',
+                  'ml_predictions', 'algorithm_comparison', 'insights')
+
+def _quote_price_data(provider, symbol):
+    """Get today's price and change for a stock"""
+    quote = provider.get_quote(symbol)
     
-    # Get ML predictions
-    ml_predictions = get_ml_predictions(symbol, algorithm='ensemble', days=30)
+    if quote is None:
+        return None
+    return {
+        'price': quote['price'],
+        'change': quote['price'] - quote['open'],
+        'changePercent': ((quote['price'] - quote['open']) / quote['open']) * 100
+    }
+
+def _fetch_history(symbol):
+    """Fetch the price history shared by the prediction and comparison stages"""
+    return StockPredictor(symbol).fetch_data(years=2)
+
+def _predict(symbol, algorithm, history):
+    """Predictions by ``algorithm`` trained on the last year of the shared history"""
+    if history is None:
+        return None
+    last_year = history.loc[history.index[-1] - timedelta(days=365):]
+    return get_ml_predictions(symbol, algorithm=algorithm, days=30, data=last_year)
+
+def _compare(symbol, history):
+    """Algorithm comparison on the shared history"""
+    if history is None:
+        return {}
+    return compare_algorithm_performance(symbol, data=history)
+
+def _insights(symbol, info, price_data, ml_predictions):
+    """Insights written from the shared company info, quote and predictions"""
+    return generate_stock_insights(symbol, price_data, ml_predictions, info=info or {})
+
+@timed('summary.total')
+def get_stock_sentiment_summary(symbol, algorithm='ensemble', on_progress=None):
+    """Get a combined sentiment and summary for a stock.
+
+    The work runs as a graph of stages: news, company info, today's quote
+    and the price history are fetched concurrently, the ML predictions and
+    algorithm comparison then run in parallel on the shared history, and
+    the insights are written once their inputs are in. The predictions run
+    in this process so they reuse the fitted models in ``model_registry``;
+    the comparison backtest trains its own models in a worker process.
+    ``algorithm`` (a key of ALGORITHM_MODELS) makes the predictions.
+    ``on_progress`` receives ``(stage_name, status)`` updates, and each
+    stage's wall time is recorded as a ``stage.<name>`` span.
+    """
+    provider = get_provider()
     
-    # Generate insights
-    insights = generate_stock_insights(symbol, price_data, ml_predictions)
+    results = run_stages([
+        Stage('news_sentiment', get_news_sentiment, args=(symbol, 5, provider)),
+        Stage('info', provider.get_info, args=(symbol,)),
+        Stage('price_data', _quote_price_data, args=(provider, symbol)),
+        Stage('history', _fetch_history, args=(symbol,)),
+        Stage('ml_predictions', _predict, deps=['history'], args=(symbol, algorithm)),
+        Stage('algorithm_comparison', _compare, deps=['history'], args=(symbol,), cpu_bound=True),
+        Stage('insights', _insights, deps=['info', 'price_data', 'ml_predictions'], args=(symbol,)),
+    ], on_progress=on_progress)
+    
+    news_sentiment = results['news_sentiment'] or {"error": "No news found"}
     
     # Calculate overall sentiment score
     if "overall_sentiment" in news_sentiment:
@@ -189,15 +264,12 @@ def get_stock_sentiment_summary(symbol):
         vader_score = 0
         sentiment_label = "Neutral"
     
-    # Compare algorithm performance
-    algo_comparison = compare_algorithm_performance(symbol)
-    
     return {
         "symbol": symbol,
-        "insights": insights,
+        "insights": results['insights'],
         "news_sentiment": news_sentiment,
         "sentiment_score": vader_score,
         "sentiment_label": sentiment_label,
-        "ml_predictions": ml_predictions,
-        "algorithm_comparison": algo_comparison
+        "ml_predictions": results['ml_predictions'],
+        "algorithm_comparison": results['algorithm_comparison'] or {}
     }
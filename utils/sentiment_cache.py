@@ -0,0 +1,104 @@
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Persistent store of sentiment scores keyed by a hash of the normalized text
+# and the scoring models' version. Scores for a given text never change, so
+# entries have no TTL; the least recently used ones are evicted once the
+# cache grows past its size limit.
+CACHE_PATH = os.environ.get('SENTIMENT_CACHE_PATH', os.path.join('data', 'sentiment_cache.sqlite'))
+MAX_ENTRIES = 200_000
+
+def normalize_text(text):
+    """Collapse whitespace, which neither VADER nor the transformer depend on"""
+    return " ".join(text.split())
+
+def text_key(text, model_version):
+    """Cache key for a text scored by a given model version"""
+    return hashlib.sha256(f"{model_version}\0{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+class SentimentCache:
+    """SQLite-backed sentiment score cache shared by all threads in a process"""
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS sentiment '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS sentiment_last_used ON sentiment (last_used)')
+            self._connection.commit()
+        return self._connection
+
+    def get_many(self, keys):
+        """Look up many keys at once, returning a dict of the ones found"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            # Stay well below SQLite's limit on query parameters
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = connection.execute(
+                    f'SELECT key, value FROM sentiment WHERE key IN ({placeholders})', batch
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+            if found:
+                now = time.time()
+                connection.executemany('UPDATE sentiment SET last_used = ? WHERE key = ?',
+                                       [(now, key) for key in found])
+                connection.commit()
+        return found
+
+    def put_many(self, items):
+        """Store a dict of key -> sentiment result"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                'INSERT OR REPLACE INTO sentiment (key, value, last_used) VALUES (?, ?, ?)',
+                [(key, json.dumps(value), now) for key, value in items.items()]
+            )
+            connection.commit()
+            self._evict(connection)
+
+    def _evict(self, connection):
+        """Drop the least recently used entries beyond the size limit"""
+        count = connection.execute('SELECT COUNT(*) FROM sentiment').fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # Evict down to 90% of the limit so eviction doesn't run on every insert
+        excess = count - int(self.max_entries * 0.9)
+        connection.execute(
+            'DELETE FROM sentiment WHERE key IN '
+            '(SELECT key FROM sentiment ORDER BY last_used LIMIT ?)', (excess,)
+        )
+        connection.commit()
+
+    def clear(self):
+        """Remove every cached score"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute('DELETE FROM sentiment')
+            connection.commit()
+
+sentiment_cache = SentimentCache()
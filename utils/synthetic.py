@@ -0,0 +1,46 @@
+
+import numpy as np
+import pandas as pd
+
+# Synthetic market data, so benchmarks, tests and the offline market data
+# provider never need the network
+
+def make_ohlcv(days, seed=0, start='2010-01-01', price=100.0, volume=(1_000_000, 20_000_000)):
+    """Random-walk daily OHLCV bars indexed by business day
+
+    ``seed`` is anything numpy.random.default_rng accepts, e.g. a list of
+    ints combining a base seed with a symbol's hash. Daily volumes are drawn
+    uniformly from the ``volume`` range.
+    """
+    rng = np.random.default_rng(seed)
+    close = price * np.exp(np.cumsum(rng.normal(0.0003, 0.015, days)))
+    open_ = close * np.exp(rng.normal(0, 0.005, days))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, days))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, days))
+    volume = rng.integers(*volume, days)
+    index = pd.bdate_range(start, periods=days, name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=index)
+
+def make_close_panel(days, symbols, seed=0):
+    """Dates x symbols random-walk closes, with some symbols listing late"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, (days, symbols)), axis=0))
+    late = rng.choice(symbols, size=symbols // 10, replace=False)
+    for column in late:
+        close[:rng.integers(1, days // 2), column] = np.nan
+    return close
+
+_SUBJECTS = ["Shares", "The company", "Analysts", "Investors", "The stock", "Management"]
+_VERBS = ["surge", "slump", "rally", "tumble", "rebound", "stall", "beat estimates", "miss forecasts"]
+_TAILS = ["after earnings", "on guidance cut", "amid regulatory probe", "as sales jump",
+          "following upgrade", "despite strong demand", "ahead of product launch", "on merger talk"]
+
+def make_headline(rng):
+    """One random news-style headline drawn from ``rng``"""
+    return f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_TAILS)}"
+
+def make_headlines(count, seed=0):
+    """Random news-style headlines, numbered so that each one is distinct"""
+    rng = np.random.default_rng(seed)
+    return [f"{make_headline(rng)} ({i})" for i in range(count)]
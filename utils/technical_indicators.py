@@ -1,6 +1,8 @@
 
 import pandas as pd
 import numpy as np
+import math
+import re
 
 def calculate_technical_indicators(data):
     """Calculate various technical indicators from stock price data."""
@@ -58,3 +60,295 @@ def calculate_technical_indicators(data):
         "BB_middle": bb_middle.iloc[-1] if not pd.isna(bb_middle.iloc[-1]) else 0,
         "BB_width": bb_width.iloc[-1] if not pd.isna(bb_width.iloc[-1]) else 0
     }
+
+class _RollingWindow:
+    """Fixed-size window of values with O(1) running mean and variance.
+
+    Values are added with a windowed Welford update; each time the ring
+    buffer wraps around the statistics are recomputed from the buffer so
+    floating-point drift cannot build up over long streams.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.buffer = [0.0] * size
+        self.count = 0
+        self.pos = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    @property
+    def full(self):
+        return self.count == self.size
+
+    def push(self, x):
+        if self.count < self.size:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.buffer[self.pos]
+            new_mean = self.mean + (x - old) / self.size
+            self.m2 += (x - old) * (x - new_mean + old - self.mean)
+            self.mean = new_mean
+        self.buffer[self.pos] = x
+        self.pos = (self.pos + 1) % self.size
+        if self.pos == 0:
+            self._resync()
+
+    def replace_last(self, x):
+        """Revise the most recently pushed value"""
+        last = (self.pos - 1) % self.size
+        old = self.buffer[last]
+        new_mean = self.mean + (x - old) / self.count
+        self.m2 += (x - old) * (x - new_mean + old - self.mean)
+        self.mean = new_mean
+        self.buffer[last] = x
+
+    def _resync(self):
+        values = self.buffer[:self.count]
+        self.mean = sum(values) / self.count
+        self.m2 = sum((v - self.mean) ** 2 for v in values)
+
+    def std(self):
+        """Sample standard deviation (ddof=1), as pandas' rolling std"""
+        if self.count < 2:
+            return float('nan')
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+class StreamingIndicators:
+    """Incrementally maintained technical indicators for one symbol.
+
+    Holds the EMA states, rolling windows and RSI gain/loss averages needed
+    to update every indicator in constant time per bar, giving the same
+    values as ``calculate_technical_indicators`` on the full history.
+    ``update(close, new_bar=False)`` revises the current bar instead of
+    starting a new one, for intraday ticks.
+    """
+    def __init__(self):
+        self._fast_alpha = 2 / (12 + 1)
+        self._slow_alpha = 2 / (26 + 1)
+        self._gains = _RollingWindow(14)
+        self._losses = _RollingWindow(14)
+        self._sma = {20: _RollingWindow(20), 50: _RollingWindow(50), 200: _RollingWindow(200)}
+        self.n_bars = 0
+        self._prev_close = None
+        self._close = None
+        # EMA states after the current bar, and before it (for revisions)
+        self._ema_fast = self._ema_slow = None
+        self._ema_fast_prev = self._ema_slow_prev = None
+
+    @classmethod
+    def from_history(cls, data):
+        """Build the state from a price history DataFrame"""
+        indicators = cls()
+        for close in data['Close'].to_numpy(dtype=float).ravel():
+            indicators.update(close)
+        return indicators
+
+    def _gain_loss(self, close, prev_close):
+        if prev_close is None:
+            return 0.0, 0.0
+        delta = close - prev_close
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    def _ema(self, prev, alpha, close):
+        return close if prev is None else prev + alpha * (close - prev)
+
+    def update(self, close, new_bar=True):
+        """Add a bar's close (or revise the current bar's close) and return the indicators"""
+        close = float(close)
+        if new_bar or self.n_bars == 0:
+            gain, loss = self._gain_loss(close, self._close)
+            self._gains.push(gain)
+            self._losses.push(loss)
+            for window in self._sma.values():
+                window.push(close)
+            self._ema_fast_prev, self._ema_slow_prev = self._ema_fast, self._ema_slow
+            self._prev_close = self._close
+            self.n_bars += 1
+        else:
+            gain, loss = self._gain_loss(close, self._prev_close)
+            self._gains.replace_last(gain)
+            self._losses.replace_last(loss)
+            for window in self._sma.values():
+                window.replace_last(close)
+
+        self._close = close
+        self._ema_fast = self._ema(self._ema_fast_prev, self._fast_alpha, close)
+        self._ema_slow = self._ema(self._ema_slow_prev, self._slow_alpha, close)
+        return self.values()
+
+    def values(self):
+        """Current indicator values, in the format of calculate_technical_indicators"""
+        if self.n_bars == 0:
+            return calculate_technical_indicators(pd.DataFrame())
+
+        rsi = 0
+        if self._gains.full:
+            avg_gain, avg_loss = self._gains.mean, self._losses.mean
+            if avg_loss > 0:
+                rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+            elif avg_gain > 0:
+                rsi = 100.0
+
+        def sma(period):
+            window = self._sma[period]
+            return window.mean if window.full else 0
+
+        bb_middle = sma(20)
+        bb_width = 0
+        if self._sma[20].full and bb_middle:
+            bb_width = 4 * self._sma[20].std() / bb_middle
+
+        return {
+            "RSI": rsi,
+            "MACD": self._ema_fast - self._ema_slow,
+            "SMA_20": sma(20),
+            "SMA_50": sma(50),
+            "SMA_200": sma(200),
+            "BB_middle": bb_middle,
+            "BB_width": bb_width
+        }
+
+# Indicators produced by calculate_indicator_panel, besides the close itself
+PANEL_INDICATORS = ["RSI", "MACD", "SMA_20", "SMA_50", "SMA_200", "BB_middle", "BB_width"]
+
+def _panel_rolling_mean(values, window):
+    """Rolling mean down each column; NaN until a window holds no missing values"""
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    window_sums = sums.copy()
+    window_sums[window:] -= sums[:-window]
+    window_counts = counts.copy()
+    window_counts[window:] -= counts[:-window]
+    result = window_sums / window
+    result[window_counts < window] = np.nan
+    return result
+
+def _panel_rolling_std(values, window):
+    """Rolling sample standard deviation down each column (NaN if a window has gaps)"""
+    result = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+        result[window - 1:] = windows.std(axis=-1, ddof=1)
+    return result
+
+def _panel_ema(values, span):
+    """EMA (adjust=False) down each column, starting at each column's first price
+
+    Missing prices are skipped: the EMA carries over them and is NaN there.
+    """
+    alpha = 2 / (span + 1)
+    result = np.full(values.shape, np.nan)
+    state = np.full(values.shape[1], np.nan)
+    for t in range(len(values)):
+        row = values[t]
+        state = np.where(np.isnan(state), row, np.where(np.isnan(row), state, state + alpha * (row - state)))
+        result[t] = np.where(np.isnan(row), np.nan, state)
+    return result
+
+def calculate_indicator_panel(close, dtype=np.float64):
+    """Calculate full indicator time series for a whole panel of symbols at once.
+
+    ``close`` is a 2-D array (or DataFrame) of closing prices shaped
+    dates x symbols, with NaN where a symbol has no price (e.g. before it
+    listed). Each indicator is returned as an array of the same shape,
+    computed as in calculate_technical_indicators but for every date, and
+    NaN until enough prices are available. Pass ``dtype=np.float32`` for
+    compact output; the computation itself runs in float64.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    if close.ndim == 1:
+        close = close[:, np.newaxis]
+    missing = np.isnan(close)
+
+    # RSI (14-period), counting each series' first day as no change
+    delta = np.full(close.shape, np.nan)
+    delta[1:] = np.diff(close, axis=0)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gain[missing] = np.nan
+    loss[missing] = np.nan
+    avg_gain = _panel_rolling_mean(gain, 14)
+    avg_loss = _panel_rolling_mean(loss, 14)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+    # MACD
+    macd = _panel_ema(close, 12) - _panel_ema(close, 26)
+
+    # Simple Moving Averages and Bollinger Bands
+    sma_20 = _panel_rolling_mean(close, 20)
+    sma_50 = _panel_rolling_mean(close, 50)
+    sma_200 = _panel_rolling_mean(close, 200)
+    bb_std = _panel_rolling_std(close, 20)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bb_width = (4 * bb_std) / sma_20
+
+    panel = {
+        "close": close,
+        "RSI": rsi,
+        "MACD": macd,
+        "SMA_20": sma_20,
+        "SMA_50": sma_50,
+        "SMA_200": sma_200,
+        "BB_middle": sma_20,
+        "BB_width": bb_width
+    }
+    return {name: values.astype(dtype, copy=False) for name, values in panel.items()}
+
+_SCREEN_CLAUSE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*|[-+]?\d*\.?\d+)\s*(<=|>=|==|!=|<|>)\s*([A-Za-z_][A-Za-z0-9_]*|[-+]?\d*\.?\d+)\s*$")
+_SCREEN_OPS = {
+    "<": np.less, "<=": np.less_equal, ">": np.greater,
+    ">=": np.greater_equal, "==": np.equal, "!=": np.not_equal
+}
+
+def screen(panel, query, symbols=None, row=-1, sort_by=None, descending=False):
+    """Select the symbols whose indicators satisfy a query on one date.
+
+    ``query`` combines comparisons with ``and`` / ``or`` (``and`` binds
+    tighter), e.g. ``"RSI < 30 and close > SMA_200"``. Operands are
+    indicator names (case-insensitive) or numbers; comparisons involving a
+    missing value are false. ``row`` selects the date (default: the last).
+    Returns the matching symbols if ``symbols`` is given, otherwise a
+    boolean mask over the panel's columns. With ``sort_by`` (an indicator
+    name), matching symbols are ranked by that indicator, lowest first
+    unless ``descending``.
+    """
+    names = {name.lower(): name for name in panel}
+
+    def operand(token):
+        if token.lower() in names:
+            return panel[names[token.lower()]][row]
+        try:
+            return float(token)
+        except ValueError:
+            raise ValueError(f"Unknown indicator in screen query: {token}")
+
+    def clause(text):
+        match = _SCREEN_CLAUSE.match(text)
+        if not match:
+            raise ValueError(f"Invalid screen condition: {text.strip()}")
+        left, op, right = match.groups()
+        with np.errstate(invalid='ignore'):
+            return _SCREEN_OPS[op](operand(left), operand(right))
+
+    mask = None
+    for alternative in re.split(r"\s+or\s+", query.strip(), flags=re.IGNORECASE):
+        conjunction = None
+        for part in re.split(r"\s+and\s+", alternative, flags=re.IGNORECASE):
+            result = clause(part)
+            conjunction = result if conjunction is None else conjunction & result
+        mask = conjunction if mask is None else mask | conjunction
+
+    mask = np.broadcast_to(mask, panel["close"].shape[1:])
+    if symbols is None:
+        return mask
+    selected = np.flatnonzero(mask)
+    if sort_by is not None:
+        # Stable sort, so ties keep the panel's column order
+        keys = operand(sort_by)[selected]
+        selected = selected[np.argsort(-keys if descending else keys, kind='stable')]
+    return [symbols[i] for i in selected]